@@ -2,10 +2,11 @@ from urllib.parse import urlencode
 
 import requests
 from app.api.api_login.logins.login_user_origin import login_user_origin
-from app.celery_worker.tasks import task_generate_avatar
+from app.celery_worker.tasks import task_avatar_created
 from app.config.config import settings
 from app.database import get_db
 from app.api.api_login import api_router_login
+from app.util.avatar.default_avatar import ensure_default_avatar
 from app.util.rest_util import get_failed_response
 from app.util.util import get_user_tokens
 from fastapi import Depends, Request, status, Response
@@ -44,7 +45,9 @@ async def log_user_in(
             db.add(user)
             await db.refresh(user)
             await db.commit()
-            _ = task_generate_avatar.delay(user.avatar_filename(), user.id)
+            # The default avatar is generated when it's first requested, the client is told
+            # it's ready so it requests it.
+            _ = task_avatar_created.delay(user.id)
         else:
             await db.commit()
 
@@ -121,6 +124,7 @@ async def apple_callback(
         if user_created:
             user = user.serialize_no_detail
         else:
+            await ensure_default_avatar(user)
             user = user.serialize
 
         params = dict()
@@ -171,6 +175,7 @@ async def apple_verify(
         if user_created:
             user = user.serialize_no_detail
         else:
+            await ensure_default_avatar(user)
             user = user.serialize
 
         # We don't refresh the user object because we know all we want to know
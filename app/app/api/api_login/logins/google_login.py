@@ -12,10 +12,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.api.api_login import api_router_login
 from app.api.api_v1 import api_router_v1
 from app.api.api_login.logins.login_user_origin import login_user_origin
-from app.celery_worker.tasks import task_generate_avatar
+from app.celery_worker.tasks import task_avatar_created
 from app.config.config import settings
 from app.database import get_db
 from app.models import User
+from app.util.avatar.default_avatar import ensure_default_avatar
 from app.util.rest_util import get_failed_response
 from app.util.util import get_user_tokens
 
@@ -67,7 +68,9 @@ async def log_user_in(
             db.add(user)
             await db.refresh(user)
             await db.commit()
-            _ = task_generate_avatar.delay(user.avatar_filename(), user.id)
+            # The default avatar is generated when it's first requested, the client is told
+            # it's ready so it requests it.
+            _ = task_avatar_created.delay(user.id)
         else:
             await db.commit()
 
@@ -202,6 +205,7 @@ async def login_google_token(
         if user_created:
             user = user.serialize_no_detail
         else:
+            await ensure_default_avatar(user)
             user = user.serialize
 
         # We don't refresh the user object because we know all we want to know
@@ -9,7 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.api_login import api_router_login
 from app.api.api_login.logins.login_user_origin import login_user_origin
-from app.celery_worker.tasks import task_generate_avatar
+from app.celery_worker.tasks import task_avatar_created
 from app.config.config import settings
 from app.database import get_db
 from app.models import User
@@ -99,7 +99,9 @@ async def reddit_callback(
             db.add(user)
             await db.refresh(user)
             await db.commit()
-            _ = task_generate_avatar.delay(user.avatar_filename(), user.id)
+            # The default avatar is generated when it's first requested, the client is told
+            # it's ready so it requests it.
+            _ = task_avatar_created.delay(user.id)
         else:
             await db.commit()
 
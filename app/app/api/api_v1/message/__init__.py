@@ -1,5 +1,7 @@
 from . import (
     get_global_messages,
+    get_global_messages_archive,
+    get_inbox,
     get_personal_messages,
     read_message_personal,
     send_message_global,
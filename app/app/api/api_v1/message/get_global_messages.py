@@ -1,13 +1,14 @@
 from fastapi import Depends, Request
-from fastapi_pagination import Page
-from fastapi_pagination.ext.sqlalchemy import paginate
+from fastapi_pagination import Page, Params
 from sqlalchemy import desc
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
 from app.api.api_v1 import api_router_v1
+from app.config.config import settings
 from app.database import get_db
 from app.models.message import GlobalMessage
+from app.util.pagination_util import get_page_total, global_message_count_key, paginate_with_total
 from app.util.util import check_token, get_auth_token
 
 
@@ -16,7 +17,11 @@ def get_failed_response_messages():
 
 
 @api_router_v1.get("/get/message/global", response_model=Page[GlobalMessage], status_code=200)
-async def get_global_message(request: Request, db: AsyncSession = Depends(get_db)):
+async def get_global_message(
+    request: Request,
+    params: Params = Depends(),
+    db: AsyncSession = Depends(get_db),
+):
     auth_token = get_auth_token(request.headers.get("Authorization"))
     if auth_token == "":
         return get_failed_response_messages()
@@ -25,4 +30,12 @@ async def get_global_message(request: Request, db: AsyncSession = Depends(get_db
     if not user:
         return get_failed_response_messages()
 
-    return await paginate(db, select(GlobalMessage).order_by(desc(GlobalMessage.timestamp)))
+    global_message_statement = select(GlobalMessage).order_by(desc(GlobalMessage.timestamp))
+    total = await get_page_total(
+        db,
+        settings.GLOBAL_MESSAGE_TOTAL_MODE,
+        global_message_statement,
+        global_message_count_key,
+        GlobalMessage.__tablename__,
+    )
+    return await paginate_with_total(db, global_message_statement, params, total)
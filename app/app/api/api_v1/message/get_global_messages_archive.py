@@ -0,0 +1,56 @@
+from datetime import date
+
+from fastapi import Depends, Request, Response
+from pydantic import BaseModel, Field
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.api.api_v1 import api_router_v1
+from app.database import get_db
+from app.models.message import GlobalMessageArchive
+from app.util.rest_util import get_failed_response
+from app.util.util import check_token, get_auth_token
+
+
+class GetMessageGlobalArchiveRequest(BaseModel):
+    day: date
+    # The archive of a day is returned one chunk at a time, starting with chunk 0.
+    chunk: int = Field(default=0, ge=0)
+
+
+@api_router_v1.post("/get/message/global/archive", status_code=200)
+async def get_global_message_archive(
+    get_message_global_archive_request: GetMessageGlobalArchiveRequest,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+) -> dict:
+    auth_token = get_auth_token(request.headers.get("Authorization"))
+    if auth_token == "":
+        return get_failed_response("an error occurred", response)
+
+    user = await check_token(db, auth_token)
+    if not user:
+        return get_failed_response("an error occurred", response)
+
+    # Older global messages are not in the GlobalMessage table anymore.
+    # They are retrieved per day from the archive, in chunks.
+    day = get_message_global_archive_request.day
+    archive_statement = (
+        select(GlobalMessageArchive)
+        .where(GlobalMessageArchive.day == day)
+        .where(GlobalMessageArchive.chunk == get_message_global_archive_request.chunk)
+    )
+    results = await db.execute(archive_statement)
+    result = results.first()
+    if result is None:
+        return get_failed_response("no archived messages found", response)
+    archive: GlobalMessageArchive = result.GlobalMessageArchive
+
+    chunks_statement = select(func.count(GlobalMessageArchive.id)).where(
+        GlobalMessageArchive.day == day
+    )
+    chunks_results = await db.execute(chunks_statement)
+
+    return {"result": True, "archive": archive.serialize, "chunks": chunks_results.scalar()}
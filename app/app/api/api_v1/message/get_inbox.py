@@ -0,0 +1,36 @@
+from fastapi import Depends, Request
+from fastapi_pagination import Page
+from fastapi_pagination.ext.sqlalchemy import paginate
+from sqlalchemy import desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.api.api_v1 import api_router_v1
+from app.database import get_db
+from app.models import Friend
+from app.util.util import check_token, get_auth_token
+
+
+def get_failed_response_inbox():
+    return {"items": [], "total": 0, "page": 1, "size": 1, "pages": 0}
+
+
+@api_router_v1.get("/get/inbox", response_model=Page[Friend], status_code=200)
+async def get_inbox(request: Request, db: AsyncSession = Depends(get_db)):
+    auth_token = get_auth_token(request.headers.get("Authorization"))
+    if auth_token == "":
+        return get_failed_response_inbox()
+
+    user = await check_token(db, auth_token)
+    if not user:
+        return get_failed_response_inbox()
+
+    # Every conversation is a Friend object which holds the last message and the unread count.
+    # So the whole inbox is retrieved from the Friend table only, most recent conversation first.
+    return await paginate(
+        db,
+        select(Friend)
+        .where(Friend.user_id == user.id)
+        .where(Friend.last_message_timestamp.is_not(None))
+        .order_by(desc(Friend.last_message_timestamp)),
+    )
@@ -1,15 +1,20 @@
 from fastapi import Depends, Request
-from fastapi_pagination import Page
-from fastapi_pagination.ext.sqlalchemy import paginate
+from fastapi_pagination import Page, Params
 from pydantic import BaseModel
-from sqlalchemy import desc
+from sqlalchemy import and_, desc, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
 from app.api.api_v1 import api_router_v1
+from app.config.config import settings
 from app.database import get_db
 from app.models import User
 from app.models.message import PersonalMessage
+from app.util.pagination_util import (
+    get_page_total,
+    paginate_with_total,
+    personal_message_count_key,
+)
 from app.util.util import check_token, get_auth_token
 
 
@@ -25,6 +30,7 @@ class GetMessagePersonalRequest(BaseModel):
 async def get_personal_message(
     request: Request,
     get_message_personal_request: GetMessagePersonalRequest,
+    params: Params = Depends(),
     db: AsyncSession = Depends(get_db),
 ):
     auth_token = get_auth_token(request.headers.get("Authorization"))
@@ -43,13 +49,27 @@ async def get_personal_message(
         return None
     user_get = result.User
 
-    return await paginate(
-        db,
-        (
-            select(PersonalMessage)
-            .filter_by(user_id=user_request.id, receiver_id=user_get.id)
-            .union(
-                select(PersonalMessage).filter_by(user_id=user_get.id, receiver_id=user_request.id)
+    personal_message_statement = (
+        select(PersonalMessage)
+        .where(
+            or_(
+                and_(
+                    PersonalMessage.user_id == user_request.id,
+                    PersonalMessage.receiver_id == user_get.id,
+                ),
+                and_(
+                    PersonalMessage.user_id == user_get.id,
+                    PersonalMessage.receiver_id == user_request.id,
+                ),
             )
-        ).order_by(desc(PersonalMessage.timestamp)),
+        )
+        .order_by(desc(PersonalMessage.timestamp))
+    )
+    total = await get_page_total(
+        db,
+        settings.PERSONAL_MESSAGE_TOTAL_MODE,
+        personal_message_statement,
+        personal_message_count_key(user_request.id, user_get.id),
+        PersonalMessage.__tablename__,
     )
+    return await paginate_with_total(db, personal_message_statement, params, total)
@@ -6,10 +6,13 @@ from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.api_v1 import api_router_v1
+from app.config.config import settings
 from app.database import get_db
 from app.models import User
 from app.models.message import GlobalMessage
-from app.sockets.sockets import sio
+from app.sockets.outbox import emit_event
+from app.util.message_writer import queue_global_message
+from app.util.pagination_util import global_message_count_key, increment_message_count
 from app.util.rest_util import get_failed_response
 from app.util.util import check_token, get_auth_token
 
@@ -46,11 +49,17 @@ async def send_global_message(
         "timestamp": now.strftime("%Y-%m-%dT%H:%M:%S.%f"),
     }
 
-    await sio.emit("send_message_global", socket_response)
+    if settings.GLOBAL_MESSAGE_WRITE_BEHIND:
+        await queue_global_message(message_body, users_username, users_id, now)
+    else:
+        new_global_message = GlobalMessage(
+            body=message_body, sender_name=users_username, sender_id=users_id, timestamp=now
+        )
+        db.add(new_global_message)
+        if settings.GLOBAL_MESSAGE_TOTAL_MODE == "counter":
+            # Only kept when it's used, every global message would wait on the same row.
+            await increment_message_count(db, global_message_count_key)
+        await db.commit()
 
-    new_global_message = GlobalMessage(
-        body=message_body, sender_name=users_username, sender_id=users_id, timestamp=now
-    )
-    db.add(new_global_message)
-    await db.commit()
+    await emit_event("send_message_global", socket_response)
     return {"result": True, "message": "success"}
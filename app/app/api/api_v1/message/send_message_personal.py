@@ -4,13 +4,16 @@ from typing import Optional
 from fastapi import Depends, Request, Response
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlmodel import select
+from sqlmodel import select, update
 
 from app.api.api_v1 import api_router_v1
+from app.config.config import settings
 from app.database import get_db
 from app.models import Friend, User
+from app.models.friend import last_message_preview_length
 from app.models.message import PersonalMessage
-from app.sockets.sockets import sio
+from app.sockets.outbox import emit_to_users
+from app.util.pagination_util import increment_message_count, personal_message_count_key
 from app.util.rest_util import get_failed_response
 from app.util.util import check_token, get_auth_token
 
@@ -50,20 +53,31 @@ async def send_personal_message(
     )
     friend_receive_results = await db.execute(friend_receive_statement)
     friend_receive_result = friend_receive_results.first()
+    now = datetime.utcnow()
+
     if not friend_receive_result:
         friend_send = user_send.befriend(user_receive)
         friend_receive = user_receive.befriend(user_send)
+        friend_send.update_last_message(message_body, now)
         db.add(friend_send)
     else:
         friend_receive = friend_receive_result.Friend
+        # The Friend object of the sender is not loaded, so we update its last message directly.
+        friend_send_update_statement = (
+            update(Friend)
+            .where(Friend.user_id == user_send.id)
+            .where(Friend.friend_id == user_receive.id)
+            .values(
+                last_message=message_body[:last_message_preview_length],
+                last_message_timestamp=now,
+            )
+        )
+        await db.execute(friend_send_update_statement)
 
     friend_receive.update_unread_messages()
+    friend_receive.update_last_message(message_body, now)
     db.add(friend_receive)
 
-    now = datetime.utcnow()
-
-    room_receive = "room_%s" % user_receive.id
-    room_to = "room_%s" % user_send.id
     socket_response = {
         "sender_name": user_send.username,
         "sender_id": user_send.id,
@@ -72,17 +86,6 @@ async def send_personal_message(
         "timestamp": now.strftime("%Y-%m-%dT%H:%M:%S.%f"),
     }
 
-    await sio.emit(
-        "send_message_personal",
-        socket_response,
-        room=room_receive,
-    )
-    await sio.emit(
-        "send_message_personal",
-        socket_response,
-        room=room_to,
-    )
-
     # I could add the Friend object on the message,
     # but it's not needed for storage or retrieval, so we won't
     new_personal_message = PersonalMessage(
@@ -93,7 +96,15 @@ async def send_personal_message(
     )
 
     db.add(new_personal_message)
+    if settings.PERSONAL_MESSAGE_TOTAL_MODE == "counter":
+        await increment_message_count(db, personal_message_count_key(user_send.id, user_receive.id))
     await db.commit()
+
+    await emit_to_users(
+        "send_message_personal",
+        socket_response,
+        [user_receive.id, user_send.id],
+    )
     return {
         "result": True,
     }
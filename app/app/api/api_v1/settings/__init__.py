@@ -2,7 +2,10 @@ from . import (
     change_avatar,
     change_password,
     change_username,
+    get_avatar,
+    get_avatar_blob,
     get_avatar_user,
     is_avatar_default,
     reset_avatar,
+    upload_avatar,
 )
@@ -1,25 +1,33 @@
-import base64
-import io
-import os
-import stat
 from typing import Optional
 
 from fastapi import Depends, Request, Response
-from PIL import Image
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.api_v1 import api_router_v1
 from app.config.config import settings
 from app.database import get_db
 from app.models import User
+from app.util.avatar.avatar_blob import (
+    remove_avatar_files_async,
+    set_avatar_blobs,
+    store_avatar_blobs_async,
+)
+from app.util.avatar.process_avatar import process_avatar_async
 from app.util.rest_util import get_failed_response
 from app.util.util import check_token, get_auth_token
 
 
+# The length of the base64 of an avatar with the maximum size, with room for a line break
+# (possibly \r\n) after every 76 characters like encodebytes adds. This only refuses the
+# requests that are much too large early, decode_avatar checks the size of the image.
+avatar_base64_length = 4 * -(-settings.AVATAR_MAX_BYTES // 3)
+avatar_base64_max_length = avatar_base64_length + 2 * -(-avatar_base64_length // 76)
+
+
 class ChangeAvatarRequest(BaseModel):
-    avatar: str
-    avatar_small: str
+    avatar: str = Field(max_length=avatar_base64_max_length)
+    avatar_small: str = Field(max_length=avatar_base64_max_length)
 
 
 @api_router_v1.post("/change/avatar", status_code=200)
@@ -38,30 +46,29 @@ async def change_avatar(
     if not user:
         return get_failed_response("An error occurred", response)
 
-    new_avatar = change_avatar_request.avatar
-    new_avatar_small = change_avatar_request.avatar_small
-
-    new_avatar_pil = Image.open(io.BytesIO(base64.b64decode(new_avatar)))
-    new_avatar_small_pil = Image.open(io.BytesIO(base64.b64decode(new_avatar_small)))
-
-    # Get the file name and path
-    file_folder = settings.UPLOAD_FOLDER_AVATARS
-    file_name = user.avatar_filename()
-    file_name_small = user.avatar_filename() + "_small"
-    # Store the image under the same hash but without the "default".
-    file_path = os.path.join(file_folder, "%s.png" % file_name)
-    file_path_small = os.path.join(file_folder, "%s.png" % file_name_small)
-
-    new_avatar_pil.save(file_path)
-    new_avatar_small_pil.save(file_path_small)
-    os.chmod(file_path, stat.S_IRWXO)
-    os.chmod(file_path_small, stat.S_IRWXO)
+    try:
+        avatar_images = await process_avatar_async(
+            change_avatar_request.avatar,
+            change_avatar_request.avatar_small,
+        )
+    except ValueError as e:
+        return get_failed_response(str(e), response)
+    # The images are stored by their hash, an image that is already stored is shared.
+    await store_avatar_blobs_async(avatar_images)
 
+    legacy_avatar_paths = await set_avatar_blobs(
+        db, user, [avatar_image.hash for avatar_image in avatar_images]
+    )
     user.set_default_avatar(False)
+    user.bump_avatar_version()
     db.add(user)
     await db.commit()
+    # Stored again if the cron job removed a blob before its reference was added.
+    await store_avatar_blobs_async(avatar_images)
+    await remove_avatar_files_async(legacy_avatar_paths)
 
     return {
         "result": True,
         "message": "success",
+        "avatar_url": user.get_avatar_url(True),
     }
@@ -4,12 +4,12 @@ from fastapi import Depends, Request, Response
 from pydantic import BaseModel
 from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlmodel import select, update
+from sqlmodel import select
 
 from app.api.api_v1 import api_router_v1
+from app.celery_worker.tasks import task_update_sender_name
 from app.database import get_db
 from app.models import User
-from app.models.message import GlobalMessage
 from app.util.rest_util import get_failed_response
 from app.util.util import check_token, get_auth_token
 
@@ -44,18 +44,12 @@ async def change_username(
         )
 
     user.set_new_username(new_username)
-    # update global messages
-
-    message_update_statement = (
-        update(GlobalMessage)
-        .values(sender_name=new_username)
-        .where(GlobalMessage.sender_id == user.id)
-    )
-    results = await db.execute(message_update_statement)
-
     db.add(user)
     await db.commit()
 
+    # The global messages of the user are updated in the background.
+    _ = task_update_sender_name.delay(user.id)
+
     return {
         "result": True,
         "message": new_username,
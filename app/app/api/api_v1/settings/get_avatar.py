@@ -0,0 +1,39 @@
+from fastapi import Depends, Request, Response, status
+from fastapi.responses import RedirectResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.api.api_v1 import api_router_v1
+from app.database import get_db
+from app.models import User
+from app.util.avatar.avatar_response import avatar_response
+from app.util.avatar.default_avatar import ensure_default_avatar
+
+
+@api_router_v1.get("/avatar/{user_id}/{version}", status_code=200)
+async def get_avatar(
+    user_id: int,
+    version: int,
+    request: Request,
+    small: bool = False,
+    db: AsyncSession = Depends(get_db),
+):
+    # The avatar as an image instead of base64. The version in the url changes when the
+    # avatar changes, so the response can be cached by the clients without checking again.
+    statement = select(User).where(User.id == user_id)
+    results = await db.execute(statement)
+    result = results.first()
+    if result is None:
+        return Response(status_code=status.HTTP_404_NOT_FOUND)
+    user: User = result.User
+
+    full = not small
+    if version != user.avatar_version:
+        # An old url, the avatar has changed since.
+        return RedirectResponse(
+            user.get_avatar_url(full), status_code=status.HTTP_307_TEMPORARY_REDIRECT
+        )
+
+    await ensure_default_avatar(user)
+    etag = "%s-%s-%s" % (user.id, user.avatar_version, "full" if full else "small")
+    return await avatar_response(request, user.avatar_path(full), etag)
@@ -0,0 +1,15 @@
+from fastapi import Request, Response, status
+
+from app.api.api_v1 import api_router_v1
+from app.models import AvatarBlob
+from app.util.avatar.avatar_blob import avatar_hash_pattern
+from app.util.avatar.avatar_response import avatar_response
+
+
+@api_router_v1.get("/avatar_blob/{avatar_hash}", status_code=200)
+async def get_avatar_blob(avatar_hash: str, request: Request):
+    # The url is the hash of the image, so it's the same for everyone with that image and
+    # it never changes. There is no need to look anything up in the database.
+    if not avatar_hash_pattern.match(avatar_hash):
+        return Response(status_code=status.HTTP_404_NOT_FOUND)
+    return await avatar_response(request, AvatarBlob.file_path(avatar_hash), avatar_hash)
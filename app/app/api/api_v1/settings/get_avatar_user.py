@@ -1,14 +1,12 @@
-import base64
-import os
 from typing import Optional
 
 from fastapi import Depends, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.api_v1 import api_router_v1
-from app.config.config import settings
 from app.database import get_db
 from app.models import User
+from app.util.avatar.default_avatar import ensure_default_avatar
 from app.util.rest_util import get_failed_response
 from app.util.util import check_token, get_auth_token
 
@@ -28,18 +26,9 @@ async def get_avatar_user(
     if not user_avatar:
         return get_failed_response("An error occurred", response)
 
-    file_folder = settings.UPLOAD_FOLDER_AVATARS
-    if user_avatar.is_default():
-        file_name = user_avatar.avatar_filename_default()
-    else:
-        file_name = user_avatar.avatar_filename()
-
-    file_path = os.path.join(file_folder, "%s.png" % file_name)
-
-    if not os.path.isfile(file_path):
+    await ensure_default_avatar(user_avatar)
+    image_as_base64 = user_avatar.get_user_avatar(True)
+    if image_as_base64 is None:
         return get_failed_response("An error occurred", response)
     else:
-        with open(file_path, "rb") as fd:
-            image_as_base64 = base64.encodebytes(fd.read()).decode()
-
         return {"result": True, "avatar": image_as_base64}
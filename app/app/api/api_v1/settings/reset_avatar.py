@@ -1,14 +1,13 @@
-import base64
-import os
 from typing import Optional
 
 from fastapi import Depends, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.api_v1 import api_router_v1
-from app.config.config import settings
 from app.database import get_db
 from app.models import User
+from app.util.avatar.avatar_blob import remove_avatar_files_async, set_avatar_blobs
+from app.util.avatar.default_avatar import ensure_default_avatar
 from app.util.rest_util import get_failed_response
 from app.util.util import check_token, get_auth_token
 
@@ -28,18 +27,21 @@ async def reset_avatar(
     if not user_avatar:
         return get_failed_response("An error occurred", response)
 
+    # The custom avatar is not used anymore.
+    legacy_avatar_paths = await set_avatar_blobs(db, user_avatar, [])
     user_avatar.set_default_avatar(True)
+    user_avatar.bump_avatar_version()
     db.add(user_avatar)
     await db.commit()
+    await remove_avatar_files_async(legacy_avatar_paths)
 
-    file_folder = settings.UPLOAD_FOLDER_AVATARS
-    file_name = user_avatar.avatar_filename_default()
-    file_path = os.path.join(file_folder, "%s.png" % file_name)
-
-    if not os.path.isfile(file_path):
+    await ensure_default_avatar(user_avatar)
+    image_as_base64 = user_avatar.get_user_avatar(True)
+    if image_as_base64 is None:
         return get_failed_response("An error occurred", response)
     else:
-        with open(file_path, "rb") as fd:
-            image_as_base64 = base64.encodebytes(fd.read()).decode()
-
-        return {"result": True, "message": image_as_base64}
+        return {
+            "result": True,
+            "message": image_as_base64,
+            "avatar_url": user_avatar.get_avatar_url(True),
+        }
@@ -0,0 +1,107 @@
+from typing import AsyncGenerator, Optional
+
+from fastapi import Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+from app.api.api_v1 import api_router_v1
+from app.config.config import settings
+from app.database import get_db
+from app.models import User
+from app.util.avatar.avatar_blob import (
+    remove_avatar_files_async,
+    set_avatar_blobs,
+    store_avatar_blobs_async,
+)
+from app.util.avatar.process_avatar import process_avatar_upload_async
+from app.util.rest_util import get_failed_response
+from app.util.util import check_token, get_auth_token
+
+# Room for the multipart boundaries and headers around the image.
+upload_overhead_bytes = 16 * 1024
+
+
+async def limited_stream(request: Request, max_bytes: int) -> AsyncGenerator[bytes, None]:
+    # Stops receiving the body as soon as it's too large, also without a Content-Length.
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_bytes:
+            raise MultiPartException("Avatar is too large")
+        yield chunk
+
+
+async def read_upload(request: Request, max_bytes: int) -> bytes:
+    # The form is parsed here instead of with File(...), that would receive the whole body
+    # before the endpoint could refuse it.
+    content_type = request.headers.get("Content-Type", "")
+    if not content_type.lower().startswith("multipart/form-data"):
+        raise MultiPartException("No avatar was uploaded")
+    content_length = request.headers.get("Content-Length")
+    if content_length is not None and content_length.isdigit():
+        if int(content_length) > max_bytes + upload_overhead_bytes:
+            raise MultiPartException("Avatar is too large")
+    parser = MultiPartParser(
+        request.headers,
+        limited_stream(request, max_bytes + upload_overhead_bytes),
+        max_files=1,
+        max_fields=0,
+    )
+    form = await parser.parse()
+    try:
+        avatar = form.get("avatar")
+        if not isinstance(avatar, UploadFile):
+            raise MultiPartException("No avatar was uploaded")
+        avatar_bytes = await avatar.read()
+    finally:
+        await form.close()
+    if len(avatar_bytes) > max_bytes:
+        raise MultiPartException("Avatar is too large")
+    return avatar_bytes
+
+
+@api_router_v1.post("/change/avatar/upload", status_code=200)
+async def upload_avatar(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+) -> dict:
+    # Like change/avatar, but with one image as a multipart file named "avatar".
+    # The sizes are made here.
+    auth_token = get_auth_token(request.headers.get("Authorization"))
+
+    if auth_token == "":
+        return get_failed_response("An error occurred", response)
+
+    user: Optional[User] = await check_token(db, auth_token)
+    if not user:
+        return get_failed_response("An error occurred", response)
+
+    try:
+        avatar_bytes = await read_upload(request, settings.AVATAR_MAX_BYTES)
+    except MultiPartException as e:
+        return get_failed_response(e.message, response)
+
+    try:
+        avatar_images = await process_avatar_upload_async(avatar_bytes)
+    except ValueError as e:
+        return get_failed_response(str(e), response)
+    await store_avatar_blobs_async(avatar_images)
+
+    legacy_avatar_paths = await set_avatar_blobs(
+        db, user, [avatar_image.hash for avatar_image in avatar_images]
+    )
+    user.set_default_avatar(False)
+    user.bump_avatar_version()
+    db.add(user)
+    await db.commit()
+    # Stored again if the cron job removed a blob before its reference was added.
+    await store_avatar_blobs_async(avatar_images)
+    await remove_avatar_files_async(legacy_avatar_paths)
+
+    return {
+        "result": True,
+        "message": "success",
+        "avatar_url": user.get_avatar_url(True),
+    }
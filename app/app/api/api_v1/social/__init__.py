@@ -1 +1,9 @@
-from . import accept_request, add_friend, deny_request, get_avatars, get_user, search_friend
+from . import (
+    accept_request,
+    add_friend,
+    deny_request,
+    get_avatars,
+    get_online,
+    get_user,
+    search_friend,
+)
@@ -8,7 +8,7 @@ from sqlmodel import select
 from app.api.api_v1 import api_router_v1
 from app.database import get_db
 from app.models import Friend, User
-from app.sockets.sockets import sio
+from app.sockets.outbox import emit_to_users
 from app.util.rest_util import get_failed_response
 from app.util.util import check_token, get_auth_token
 
@@ -71,11 +71,10 @@ async def accept_friend(
     socket_response = {
         "from": user_from.serialize_no_detail,
     }
-    room_to = "room_%s" % user_befriend.id
-    await sio.emit(
+    await emit_to_users(
         "accept_friend_request",
         socket_response,
-        room=room_to,
+        [user_befriend.id],
     )
 
     return {"result": True, "message": "success"}
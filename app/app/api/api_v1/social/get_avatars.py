@@ -6,8 +6,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
 from app.api.api_v1 import api_router_v1
+from app.config.config import settings
 from app.database import get_db
 from app.models import User
+from app.util.avatar.avatar_loader import load_avatars
 from app.util.rest_util import get_failed_response
 from app.util.util import check_token, get_auth_token
 
@@ -32,11 +34,15 @@ async def get_avatars(
     if not user_request:
         return get_failed_response("An error occurred", response)
 
+    if len(get_avatars_request.avatars) > settings.AVATAR_BATCH_MAX:
+        return get_failed_response("Too many avatars requested", response)
+
     statement_hexes = select(User).filter(User.id.in_(get_avatars_request.avatars))
     results = await db.execute(statement_hexes)
-    users = results.all()
+    users = [use.User for use in results.all()]
+    # All the avatar files are read at once in the thread pool.
+    avatars_base64 = await load_avatars(users)
     avatars = []
-    for use in users:
-        user = use.User
-        avatars.append(user.serialize_get)
+    for user in users:
+        avatars.append(user.serialize_get_with_avatar(avatars_base64.get(user.id)))
     return {"result": True, "avatars": avatars}
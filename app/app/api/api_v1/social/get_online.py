@@ -0,0 +1,42 @@
+from typing import List, Optional
+
+from fastapi import Depends, Request, Response
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.api_v1 import api_router_v1
+from app.database import get_db
+from app.models import User
+from app.sockets.presence import get_online_users
+from app.util.rest_util import get_failed_response
+from app.util.util import check_token, get_auth_token
+
+max_online_request = 500
+
+
+class GetOnlineRequest(BaseModel):
+    user_ids: List[int]
+
+
+@api_router_v1.post("/get/online", status_code=200)
+async def get_online(
+    get_online_request: GetOnlineRequest,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+) -> dict:
+    auth_token = get_auth_token(request.headers.get("Authorization"))
+
+    if auth_token == "":
+        return get_failed_response("An error occurred", response)
+
+    user_request: Optional[User] = await check_token(db, auth_token)
+    if not user_request:
+        return get_failed_response("An error occurred", response)
+
+    user_ids = get_online_request.user_ids
+    if len(user_ids) > max_online_request:
+        return get_failed_response("Too many users requested", response)
+
+    online = await get_online_users(user_ids)
+    return {"result": True, "online": online}
@@ -9,6 +9,7 @@ from sqlmodel import select
 from app.api.api_v1 import api_router_v1
 from app.database import get_db
 from app.models import User
+from app.util.avatar.avatar_loader import load_avatars
 from app.util.rest_util import get_failed_response
 from app.util.util import check_token, get_auth_token
 
@@ -41,4 +42,8 @@ async def get_user(
         return get_failed_response("User not found", response)
     search_user = result.User
 
-    return {"result": True, "user": search_user.serialize_get}
+    avatars_base64 = await load_avatars([search_user])
+    return {
+        "result": True,
+        "user": search_user.serialize_get_with_avatar(avatars_base64.get(search_user.id)),
+    }
@@ -9,6 +9,7 @@ from sqlmodel import select
 from app.api.api_v1 import api_router_v1
 from app.database import get_db
 from app.models import User
+from app.util.avatar.avatar_loader import load_avatars
 from app.util.rest_util import get_failed_response
 from app.util.util import check_token, get_auth_token
 
@@ -42,4 +43,8 @@ async def search_friend(
         return get_failed_response("an error occurred", response)
     search_user: User = result.User
 
-    return {"result": True, "friend": search_user.serialize_get}
+    avatars_base64 = await load_avatars([search_user])
+    return {
+        "result": True,
+        "friend": search_user.serialize_get_with_avatar(avatars_base64.get(search_user.id)),
+    }
@@ -0,0 +1,33 @@
+from typing import Optional
+
+from fastapi import Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.api_v1 import api_router_v1
+from app.database import get_db
+from app.models import User
+from app.sockets.sockets import get_socket_stats
+from app.util.rest_util import get_failed_response
+from app.util.util import check_token, get_auth_token
+
+
+@api_router_v1.get("/socket/stats", status_code=200)
+async def socket_stats(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+) -> dict:
+    # The socket connections and outgoing queues of this api instance
+    auth_token = get_auth_token(request.headers.get("Authorization"))
+
+    if auth_token == "":
+        return get_failed_response("An error occurred", response)
+
+    user: Optional[User] = await check_token(db, auth_token)
+    if not user:
+        return get_failed_response("An error occurred", response)
+
+    return {
+        "result": True,
+        "stats": get_socket_stats(),
+    }
@@ -11,6 +11,7 @@ from sqlmodel import select
 from app.api.api_v1 import api_router_v1
 from app.database import get_db
 from app.models import User
+from app.util.avatar.default_avatar import ensure_default_avatar
 from app.util.rest_util import get_failed_response
 from app.util.util import get_user_tokens
 import hashlib
@@ -62,11 +63,12 @@ async def login_user(
         return get_failed_response("user name or email not found", response)
 
     user: User = result_user.User
-    return_user = copy(user.serialize)
-
     if not user.verify_password(password):
         return get_failed_response("password not correct", response)
 
+    await ensure_default_avatar(user)
+    return_user = copy(user.serialize)
+
     # If the platform is 3 we don't need to check anything anymore.
     platform_achievement = False
 
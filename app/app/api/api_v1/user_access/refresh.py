@@ -4,6 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.api_v1 import api_router_v1
 from app.database import get_db
+from app.util.avatar.default_avatar import ensure_default_avatar
 from app.util.rest_util import get_failed_response
 from app.util.util import get_user_tokens, refresh_user_token
 
@@ -30,6 +31,7 @@ async def refresh_user(
     db.add(user_token)
     await db.commit()
 
+    await ensure_default_avatar(user)
     login_response = {
         "result": True,
         "message": "user logged in successfully.",
@@ -1,4 +1,3 @@
-import asyncio
 from typing import Optional
 
 from fastapi import Depends, Response
@@ -8,10 +7,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
 from app.api.api_v1 import api_router_v1
-from app.celery_worker.tasks import task_generate_avatar
+from app.celery_worker.tasks import task_avatar_created
 from app.database import get_db
 from app.models import User
-from app.sockets.sockets import sio
 from app.util.rest_util import get_failed_response
 from app.util.util import get_user_tokens
 import hashlib
@@ -72,10 +70,12 @@ async def register_user(
     db.add(user_token)
     await db.commit()
 
-    _ = task_generate_avatar.delay(user.avatar_filename(), user.id)
+    # The default avatar is generated when it's first requested, the client is told
+    # it's ready so it requests it.
+    _ = task_avatar_created.delay(user.id)
 
     # Return the user with no friend information because they have none yet.
-    # And no avatar, because it might still be generating.
+    # And no avatar, because it's only generated when it's requested.
     return {
         "result": True,
         "message": "user created successfully.",
@@ -83,29 +83,3 @@ async def register_user(
         "refresh_token": user_token.refresh_token,
         "user": user.serialize_no_detail,
     }
-
-
-class AvatarCreatedRequest(BaseModel):
-    user_id: int
-
-
-@api_router_v1.post("/avatar/created", status_code=200)
-async def avatar_created(
-    avatar_created_request: AvatarCreatedRequest,
-) -> dict:
-    user_id = avatar_created_request.user_id
-    room = "room_%s" % user_id
-
-    # A short sleep, just in case the user has not made the socket connection yet
-    await asyncio.sleep(1)
-
-    await sio.emit(
-        "message_event",
-        "Avatar creation done!",
-        room=room,
-    )
-
-    return {
-        "result": True,
-        "message": "Avatar creation done!",
-    }
@@ -4,6 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.api_v1 import api_router_v1
 from app.database import get_db
+from app.util.avatar.default_avatar import ensure_default_avatar
 from app.util.rest_util import get_failed_response
 from app.util.util import check_token, get_user_tokens
 
@@ -23,6 +24,7 @@ async def login_token_user(
     if not user:
         return get_failed_response("user not found", response)
 
+    await ensure_default_avatar(user)
     return_user = user.serialize
     user_token = get_user_tokens(user)
     db.add(user_token)
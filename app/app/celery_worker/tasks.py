@@ -1,22 +1,47 @@
-import requests
 from celery import Celery
+from redis import Redis
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlmodel import select, update
 
 from app.config.config import settings
+from app.models import User
+from app.models.message import GlobalMessage
+from app.sockets.offline_events import emit_to_users_arguments, emit_to_users_lua
 from app.util.avatar.generate_avatar import generate_avatar
 from app.util.email.send_email import send_email
 
 celery_app = Celery("tasks", broker=settings.REDIS_URI, backend=f"db+{settings.SYNC_DB_URL}")
 
+engine_sync = create_engine(settings.SYNC_DB_URL, pool_pre_ping=True)
+
+# The worker adds socket events to the outbox, the socket servers emit them.
+redis_sync = Redis.from_url(settings.REDIS_URI, decode_responses=True)
+emit_to_users_script = redis_sync.register_script(emit_to_users_lua)
+
+sender_name_chunk_size = 1000
+
 
 @celery_app.task
 def task_generate_avatar(avatar_filename: str, user_id: int):
     generate_avatar(avatar_filename, settings.UPLOAD_FOLDER_AVATARS)
 
-    base_url = settings.BASE_URL
-    api_prefix = settings.API_V1_STR
-    endpoint = "/avatar/created"
-    total_url = base_url + api_prefix + endpoint
-    requests.post(total_url, json={"user_id": user_id})
+    _ = task_avatar_created.delay(user_id)
+
+    return {"success": True}
+
+
+@celery_app.task
+def task_avatar_created(user_id: int):
+    # Like the other events for a user, it's kept until the user acknowledges it. A user
+    # that is not connected yet after registering gets it when joining the room.
+    keys, args = emit_to_users_arguments(
+        "message_event",
+        {"message": "Avatar creation done!"},
+        [user_id],
+        ["room_%s" % user_id],
+    )
+    emit_to_users_script(keys=keys, args=args)
 
     return {"success": True}
 
@@ -36,6 +61,38 @@ def task_send_email(username: str, recipients: str, subject: str, body: str):
     return {"success": True}
 
 
+@celery_app.task
+def task_update_sender_name(user_id: int):
+    # Update the sender name on the global messages of the user in small chunks,
+    # so we never hold a lock on a large part of the table.
+    with Session(engine_sync) as session:
+        while True:
+            # Always read the current username, the user might have changed it again.
+            username = session.execute(
+                select(User.username).where(User.id == user_id)
+            ).scalar_one_or_none()
+            if username is None:
+                break
+            chunk_statement = (
+                select(GlobalMessage.id)
+                .where(GlobalMessage.sender_id == user_id)
+                .where(GlobalMessage.sender_name != username)
+                .limit(sender_name_chunk_size)
+                .scalar_subquery()
+            )
+            update_statement = (
+                update(GlobalMessage)
+                .where(GlobalMessage.id.in_(chunk_statement))
+                .values(sender_name=username)
+            )
+            result = session.execute(update_statement)
+            session.commit()
+            if result.rowcount < sender_name_chunk_size:
+                break
+
+    return {"success": True}
+
+
 @celery_app.task
 def task_activate_celery():
     return {"success": True}
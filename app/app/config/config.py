@@ -1,5 +1,7 @@
 import os
+from typing import Dict, List
 
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 
 
@@ -34,6 +36,47 @@ class Settings(BaseSettings):
 
     REDIS_URI: str = "redis://{url}:{port}".format(url=REDIS_URL, port=REDIS_PORT)
 
+    # Socket events are written to this stream and emitted by a background publisher.
+    SOCKET_OUTBOX_STREAM: str = "socket_outbox"
+    SOCKET_OUTBOX_GROUP: str = "socket_publishers"
+    SOCKET_OUTBOX_MAX_LENGTH: int = 100000
+    SOCKET_OUTBOX_BATCH_SIZE: int = 100
+    SOCKET_OUTBOX_BLOCK_MS: int = 1000
+    # Events that are not acknowledged after this time are emitted again.
+    SOCKET_OUTBOX_RETRY_MS: int = 10000
+    # Events for specific users are also kept per user until the client acknowledges them,
+    # so they can be replayed when the user joins again after being offline.
+    SOCKET_USER_EVENTS_MAX_LENGTH: int = 200
+    SOCKET_USER_EVENTS_EXPIRE: int = 604800
+
+    # With write behind enabled global messages are queued in a stream and stored in batches.
+    GLOBAL_MESSAGE_WRITE_BEHIND: bool = os.environ.get("GLOBAL_MESSAGE_WRITE_BEHIND") is not None
+    GLOBAL_MESSAGE_STREAM: str = "global_message_queue"
+    GLOBAL_MESSAGE_GROUP: str = "global_message_writers"
+    GLOBAL_MESSAGE_BATCH_SIZE: int = 500
+    GLOBAL_MESSAGE_FLUSH_MS: int = 1000
+    GLOBAL_MESSAGE_RETRY_MS: int = 30000
+    # Global messages older than this are moved to the archive.
+    GLOBAL_MESSAGE_RETENTION_DAYS: int = int(os.environ.get("GLOBAL_MESSAGE_RETENTION_DAYS") or 30)
+    # The archive stores the messages of a day in chunks of at most this many messages.
+    GLOBAL_MESSAGE_ARCHIVE_CHUNK_SIZE: int = 1000
+    # How the total of the message pages is determined. This can be "exact" which counts all
+    # the messages, "counter" which uses the MessageCount table or "estimate" which uses the
+    # estimate of the database planner. The estimate is only possible for the global messages.
+    # The counters are only kept in "counter" mode, so when switching to it the counters have
+    # to be set to the number of messages first.
+    GLOBAL_MESSAGE_TOTAL_MODE: str = os.environ.get("GLOBAL_MESSAGE_TOTAL_MODE") or "estimate"
+    PERSONAL_MESSAGE_TOTAL_MODE: str = os.environ.get("PERSONAL_MESSAGE_TOTAL_MODE") or "counter"
+
+    LOG_LEVEL: str = os.environ.get("LOG_LEVEL") or "INFO"
+    # The part of the log lines that is written for frequent events, per event.
+    # Events that are not in here are always logged.
+    LOG_SAMPLE_RATES: Dict[str, float] = {
+        "socket_connect": 1.0,
+        "socket_disconnect": 1.0,
+        "socket_message_event": 0.1,
+    }
+
     SQLALCHEMY_TRACK_MODIFICATIONS: bool = False
     SECRET_KEY: str = os.environ.get("SECRET_KEY") or "you-will-never-guess"
 
@@ -86,6 +129,30 @@ class Settings(BaseSettings):
     JWT_ISS: str = os.environ.get("JWT_ISS", "")
     JWT_AUD: str = os.environ.get("JWT_AUD", "")
     API_SOCK_NAMESPACE: str = "/api/v1.0/sock"
+    # Only allow socket connections that are authenticated with an access token.
+    # Until this is set older clients can still connect and join their room without a token.
+    SOCKET_REQUIRE_AUTH: bool = os.environ.get("SOCKET_REQUIRE_AUTH") is not None
+    # Use msgpack for the socket traffic. Clients that support it connect on the msgpack
+    # socket path, other clients keep using json. It's also used between the api instances,
+    # so it has to be enabled on all of them at the same time.
+    SOCKET_MSGPACK: bool = os.environ.get("SOCKET_MSGPACK") is not None
+    # The outgoing queue of a socket connection is limited. Above the soft limit the droppable
+    # events are held back, only the last one of every event is sent when the queue is below
+    # the soft limit again, which is checked every SOCKET_COALESCE_SECONDS. A connection that
+    # is at the hard limit for this many strikes without getting below the soft limit is
+    # disconnected.
+    SOCKET_QUEUE_SOFT_LIMIT: int = 64
+    SOCKET_QUEUE_HARD_LIMIT: int = 256
+    SOCKET_SLOW_CONSUMER_STRIKES: int = 10
+    SOCKET_DROPPABLE_EVENTS: List[str] = ["update_leaderboard"]
+    SOCKET_COALESCE_SECONDS: float = 1
+    # A user is online for this many seconds, every api instance refreshes it for the users
+    # that are connected to it.
+    PRESENCE_TTL: int = 60
+    # Every api instance refreshes its key in redis with this interval. The socket connections
+    # of an instance whose key has expired are removed from the registry by the others.
+    SOCKET_NODE_HEARTBEAT: int = 10
+    SOCKET_NODE_TTL: int = 30
 
     MAIL_SERVER: str = os.environ.get("MAIL_SERVER")
     MAIL_PORT: str = int(os.environ.get("MAIL_PORT") or 25)
@@ -95,6 +162,51 @@ class Settings(BaseSettings):
     MAIL_SENDERNAME: str = os.environ.get("MAIL_SENDERNAME")
     BASE_URL: str = os.environ.get("BASE_URL")
     UPLOAD_FOLDER_AVATARS: str = "static/uploads/avatars"
+    # The avatars are also sent inline as base64 in the user details, for the older clients.
+    # Without it the user details only have the avatar url.
+    AVATAR_INLINE: bool = (os.environ.get("AVATAR_INLINE") or "true") == "true"
+    # How long the avatar is cached by the clients, its url changes when it changes.
+    AVATAR_CACHE_MAX_AGE: int = 31536000
+    # The avatar files that are kept in memory, at most this many bytes.
+    AVATAR_CACHE_MAX_BYTES: int = int(os.environ.get("AVATAR_CACHE_MAX_BYTES") or 64 * 1024 * 1024)
+    # How often a cached avatar is checked against the file, in case another server changed it.
+    AVATAR_CACHE_CHECK_SECONDS: float = 10
+    # The threads that read the avatar files and the most avatars that can be requested at once.
+    AVATAR_LOADER_THREADS: int = 8
+    AVATAR_BATCH_MAX: int = 100
+    # Limits of the avatars that are uploaded, the images are processed in a thread pool.
+    AVATAR_MAX_BYTES: int = 2 * 1024 * 1024
+    AVATAR_MAX_DIMENSION: int = 2048
+    AVATAR_PROCESS_THREADS: int = 2
+    # The sizes that are made from an uploaded avatar, and if a webp version is made as well.
+    AVATAR_FULL_SIZE: int = 512
+    AVATAR_SMALL_SIZE: int = 128
+    AVATAR_WEBP: bool = (os.environ.get("AVATAR_WEBP") or "true") == "true"
+    # Where the avatars are kept, "file" for a file per avatar in UPLOAD_FOLDER_AVATARS or
+    # "pack" to append them to large pack files with an index in AVATAR_PACK_FOLDER.
+    AVATAR_STORE: str = os.environ.get("AVATAR_STORE") or "file"
+    AVATAR_PACK_FOLDER: str = "static/uploads/avatar_packs"
+    # A new pack file is started when the current one would become larger than this.
+    AVATAR_PACK_MAX_BYTES: int = 1024 * 1024 * 1024
+    # How often the pack index is checked for avatars that were written by other servers.
+    AVATAR_PACK_REFRESH_SECONDS: float = 1
+    # The avatar images that nobody uses anymore are removed after this many hours.
+    AVATAR_BLOB_RELEASE_HOURS: int = 24
+
+    @field_validator("GLOBAL_MESSAGE_TOTAL_MODE")
+    @classmethod
+    def check_global_message_total_mode(cls, mode: str) -> str:
+        if mode not in ["exact", "counter", "estimate"]:
+            raise ValueError("GLOBAL_MESSAGE_TOTAL_MODE should be exact, counter or estimate")
+        return mode
+
+    @field_validator("PERSONAL_MESSAGE_TOTAL_MODE")
+    @classmethod
+    def check_personal_message_total_mode(cls, mode: str) -> str:
+        # The estimate is the number of rows of the whole table, not of one conversation.
+        if mode not in ["exact", "counter"]:
+            raise ValueError("PERSONAL_MESSAGE_TOTAL_MODE should be exact or counter")
+        return mode
 
     class Config:
         case_sensitive: bool = True
@@ -1,6 +1,8 @@
 from . import message
+from .avatar_blob import AvatarBlob
 from .friend import Friend
 from .leaderboard_one_player import LeaderboardOnePlayer
 from .leaderboard_two_player import LeaderboardTwoPlayer
+from .message_count import MessageCount
 from .user import User
 from .user_token import UserToken
@@ -0,0 +1,26 @@
+import os
+from datetime import datetime
+from typing import Optional
+
+from sqlmodel import Field, SQLModel
+
+from app.config.config import settings
+
+
+class AvatarBlob(SQLModel, table=True):
+    """
+    An avatar image that is stored once, named by the hash of its content.
+    Users with the same image share it, the reference count is the number of times
+    it is used as a full or small avatar. It's removed by the cron job some time after
+    nobody uses it anymore.
+    """
+
+    __tablename__ = "AvatarBlob"
+    hash: str = Field(primary_key=True)
+    ref_count: int = Field(default=0)
+    # When the last reference was removed.
+    released_at: Optional[datetime] = Field(default=None, index=True)
+
+    @staticmethod
+    def file_path(avatar_hash: str, extension: str = "png") -> str:
+        return os.path.join(settings.UPLOAD_FOLDER_AVATARS, "%s.%s" % (avatar_hash, extension))
@@ -1,7 +1,12 @@
+from datetime import datetime
 from typing import Optional
 
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
 
+# Only a preview of the last message is stored on the Friend object
+last_message_preview_length = 200
+
 
 class Friend(SQLModel, table=True):
     """
@@ -37,6 +42,12 @@ class Friend(SQLModel, table=True):
     # Indicates if a request is made or if they are just chatting.
     # If it's filled it determines who made the first move to send the request.
     requested: Optional[bool] = Field(default=None)
+    # Pointer to the last message of the conversation, so the inbox can be
+    # shown from the Friend objects alone, without going through the messages.
+    last_message: Optional[str] = Field(default=None)
+    last_message_timestamp: Optional[datetime] = Field(default=None)
+
+    __table_args__ = (Index("friend_inbox_index", "user_id", "last_message_timestamp"),)
 
     def update_unread_messages(self):
         self.unread_messages += 1
@@ -44,6 +55,10 @@ class Friend(SQLModel, table=True):
     def read_messages(self):
         self.unread_messages = 0
 
+    def update_last_message(self, message, timestamp):
+        self.last_message = message[:last_message_preview_length]
+        self.last_message_timestamp = timestamp
+
     @property
     def serialize(self):
         return {
@@ -1,2 +1,3 @@
 from .global_message import GlobalMessage
+from .global_message_archive import GlobalMessageArchive
 from .personal_message import PersonalMessage
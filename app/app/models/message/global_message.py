@@ -10,7 +10,7 @@ class GlobalMessage(SQLModel, table=True):
 
     body: str
     sender_name: str
-    sender_id: int = Field(foreign_key="User.id")
+    sender_id: int = Field(foreign_key="User.id", index=True)
     timestamp: datetime = Field(index=True, default=datetime.utcnow())
 
     @property
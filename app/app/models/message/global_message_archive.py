@@ -0,0 +1,42 @@
+import json
+import zlib
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import Index
+from sqlmodel import Field, SQLModel
+
+
+class GlobalMessageArchive(SQLModel, table=True):
+    """
+    A chunk of at most GLOBAL_MESSAGE_ARCHIVE_CHUNK_SIZE global messages of one day, stored
+    compressed. Global messages are moved here once they are older than the retention period.
+    A chunk is never changed after it's made, the chunks of a day are numbered from 0.
+    """
+
+    __tablename__ = "GlobalMessageArchive"
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    day: date = Field(index=True)
+    chunk: int = Field(default=0)
+    message_count: int = Field(default=0)
+    # zlib compressed json list of the serialized messages
+    messages: bytes = Field(default=zlib.compress(b"[]"))
+
+    __table_args__ = (Index("global_message_archive_day_chunk_index", "day", "chunk", unique=True),)
+
+    def get_messages(self):
+        return json.loads(zlib.decompress(self.messages))
+
+    def set_messages(self, messages):
+        self.messages = zlib.compress(json.dumps(messages).encode("utf-8"), 9)
+        self.message_count = len(messages)
+
+    @property
+    def serialize(self):
+        return {
+            "day": self.day.strftime("%Y-%m-%d"),
+            "chunk": self.chunk,
+            "message_count": self.message_count,
+            "messages": self.get_messages(),
+        }
@@ -0,0 +1,18 @@
+from typing import Optional
+
+from sqlmodel import Field, SQLModel
+
+
+class MessageCount(SQLModel, table=True):
+    """
+    The number of messages in the global chat or in a personal conversation.
+    It's kept up to date when messages are stored, so the message
+    pages don't have to count all the messages every time.
+    """
+
+    __tablename__ = "MessageCount"
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    # "global" or "personal_<lowest user id>_<highest user id>"
+    key: str = Field(index=True, unique=True)
+    count: int = Field(default=0)
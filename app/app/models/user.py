@@ -1,4 +1,3 @@
-import base64
 import json
 import os
 import secrets
@@ -13,7 +12,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import Field, Relationship, SQLModel, select
 
 from app.config.config import settings
-from app.models import Friend
+from app.models import AvatarBlob, Friend
+from app.util.avatar.avatar_cache import avatar_cache
+
+# The avatar was not loaded beforehand, None is an avatar that was loaded but is missing.
+avatar_not_loaded = object()
 
 
 class User(SQLModel, table=True):
@@ -31,6 +34,12 @@ class User(SQLModel, table=True):
     origin: int
     email_verified: bool = Field(default=False)
     default_avatar: bool = Field(default=True)
+    # Changes every time the avatar changes, it's part of the avatar url so it can be cached.
+    avatar_version: int = Field(default=0)
+    # The hashes of the avatar blobs, for avatars that were changed since they are stored
+    # by their content. Older custom avatars are still stored under the avatar file name.
+    avatar_hash: Optional[str] = Field(default=None)
+    avatar_hash_small: Optional[str] = Field(default=None)
     best_score_single_butterfly: int = Field(default=0)
     best_score_double_butterfly: int = Field(default=0)
     total_flutters: int = Field(default=0)
@@ -177,23 +186,58 @@ class User(SQLModel, table=True):
     def is_default(self):
         return self.default_avatar
 
-    def get_user_avatar(self, full=False):
+    def bump_avatar_version(self):
+        self.avatar_version += 1
+
+    def avatar_blob_hash(self, full=False):
+        if self.default_avatar:
+            return None
+        return self.avatar_hash if full else self.avatar_hash_small
+
+    def legacy_avatar_paths(self):
+        # The custom avatar files from before the avatars were stored by their content.
+        if self.default_avatar or self.avatar_hash is not None:
+            return []
+        return [
+            os.path.join(settings.UPLOAD_FOLDER_AVATARS, "%s.png" % file_name)
+            for file_name in [self.avatar_filename(), self.avatar_filename_small()]
+        ]
+
+    def avatar_path(self, full=False):
+        avatar_hash = self.avatar_blob_hash(full)
+        if avatar_hash is not None:
+            return AvatarBlob.file_path(avatar_hash)
         if self.default_avatar:
             file_name = self.avatar_filename_default()
+        elif full:
+            file_name = self.avatar_filename()
         else:
-            if full:
-                file_name = self.avatar_filename()
-            else:
-                file_name = self.avatar_filename_small()
-        file_folder = settings.UPLOAD_FOLDER_AVATARS
+            file_name = self.avatar_filename_small()
+        return os.path.join(settings.UPLOAD_FOLDER_AVATARS, "%s.png" % file_name)
+
+    def get_avatar_url(self, full=False):
+        # The url only changes when the avatar changes, so clients can cache it forever.
+        avatar_hash = self.avatar_blob_hash(full)
+        if avatar_hash is not None:
+            # The same for everyone with the same image.
+            return "%s/avatar_blob/%s" % (settings.API_V1_STR, avatar_hash)
+        avatar_url = "%s/avatar/%s/%s" % (settings.API_V1_STR, self.id, self.avatar_version)
+        if not full:
+            avatar_url += "?small=true"
+        return avatar_url
+
+    def avatar_fields(self, full=False, avatar=avatar_not_loaded):
+        # The avatar can be given when it's loaded beforehand with load_avatars.
+        avatar_fields = {"avatar_url": self.get_avatar_url(full)}
+        if settings.AVATAR_INLINE:
+            # For the clients that don't use the avatar url yet.
+            if avatar is avatar_not_loaded:
+                avatar = self.get_user_avatar(full)
+            avatar_fields["avatar"] = avatar
+        return avatar_fields
 
-        file_path = os.path.join(file_folder, "%s.png" % file_name)
-        if not os.path.isfile(file_path):
-            return None
-        else:
-            with open(file_path, "rb") as fd:
-                image_as_base64 = base64.encodebytes(fd.read()).decode()
-            return image_as_base64
+    def get_user_avatar(self, full=False):
+        return avatar_cache.get_base64(self.avatar_path(full))
 
     def get_friend_ids(self):
         return [friend.serialize_minimal for friend in self.friends]
@@ -206,7 +250,7 @@ class User(SQLModel, table=True):
             "username": self.username,
             "verified": self.email_verified,
             "friends": self.get_friend_ids(),
-            "avatar": self.get_user_avatar(True),
+            **self.avatar_fields(True),
             "score": {
                 "total_flutters": self.total_flutters,
                 "total_pipes_cleared": self.total_pipes_cleared,
@@ -221,10 +265,13 @@ class User(SQLModel, table=True):
     @property
     def serialize_get(self):
         # get user details without personal information
+        return self.serialize_get_with_avatar(avatar_not_loaded)
+
+    def serialize_get_with_avatar(self, avatar: Optional[str]):
         return {
             "id": self.id,
             "username": self.username,
-            "avatar": self.get_user_avatar(True),
+            **self.avatar_fields(True, avatar),
             "score": {
                 "total_flutters": self.total_flutters,
                 "total_pipes_cleared": self.total_pipes_cleared,
@@ -241,7 +288,7 @@ class User(SQLModel, table=True):
         return {
             "id": self.id,
             "username": self.username,
-            "avatar": self.get_user_avatar(False),
+            **self.avatar_fields(False),
         }
 
     @property
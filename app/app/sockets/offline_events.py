@@ -0,0 +1,78 @@
+import json
+import re
+from typing import List
+
+from app.config.config import settings
+from app.util.redis_util import redis_client
+
+event_id_pattern = re.compile(r"^\d+-\d+$")
+
+
+def user_events_key(user_id: int):
+    # The events for a user that are not acknowledged yet
+    return "socket_user_events_%s" % user_id
+
+
+# Adds the event to the outbox and to the event stream of every user, with the same id.
+# Because the script runs atomically, the ids in the user streams are always increasing.
+# Registered by the socket servers and by the celery worker, each with their own client.
+emit_to_users_lua = """
+local event_id = redis.call(
+    'XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*',
+    'event', ARGV[3], 'data', ARGV[4], 'room', ARGV[5], 'queued', '1'
+)
+for i = 2, #KEYS do
+    redis.call(
+        'XADD', KEYS[i], 'MAXLEN', '~', ARGV[2], event_id,
+        'event', ARGV[3], 'data', ARGV[4]
+    )
+    redis.call('EXPIRE', KEYS[i], ARGV[6])
+end
+return event_id
+"""
+
+
+def emit_to_users_arguments(event: str, data, user_ids: List[int], rooms: List[str]):
+    keys = [settings.SOCKET_OUTBOX_STREAM] + [user_events_key(user_id) for user_id in user_ids]
+    args = [
+        settings.SOCKET_OUTBOX_MAX_LENGTH,
+        settings.SOCKET_USER_EVENTS_MAX_LENGTH,
+        event,
+        json.dumps(data),
+        json.dumps(rooms),
+        settings.SOCKET_USER_EVENTS_EXPIRE,
+    ]
+    return keys, args
+
+
+def add_event_id(data, event_id: str):
+    # The client acknowledges the events using this id.
+    # Only events with a dictionary as data can be acknowledged.
+    if isinstance(data, dict):
+        return {**data, "event_id": event_id}
+    return data
+
+
+async def replay_user_events(server, sid: str, user_id: int):
+    # Emit everything the user missed since the last acknowledged event.
+    events = await redis_client.xrange(
+        user_events_key(user_id), count=settings.SOCKET_USER_EVENTS_MAX_LENGTH
+    )
+    for event_id, fields in events:
+        await server.emit(
+            fields["event"],
+            add_event_id(json.loads(fields["data"]), event_id),
+            to=sid,
+        )
+
+
+async def acknowledge_user_events(user_id: int, event_id: str):
+    # Acknowledging an event also acknowledges all the events before it.
+    if not event_id_pattern.match(event_id):
+        return
+    key = user_events_key(user_id)
+    async with redis_client.pipeline(transaction=True) as pipe:
+        # Exact, an approximate trim only removes whole nodes of about 100 events.
+        pipe.xtrim(key, minid=event_id, approximate=False)
+        pipe.xdel(key, event_id)
+        await pipe.execute()
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import logging
+from typing import List
+
+from app.config.config import settings
+from app.sockets.offline_events import add_event_id, emit_to_users_arguments, emit_to_users_lua
+from app.sockets.sockets import get_user_room, sio
+from app.util.redis_util import create_consumer_group, read_stream, redis_client
+
+logger = logging.getLogger(__name__)
+
+
+async def emit_event(event: str, data, room=None):
+    # Instead of emitting the socket event while handling the request we add it
+    # to the outbox stream. The outbox publisher will emit it in the background.
+    # This should only be called after the database changes are committed.
+    await redis_client.xadd(
+        settings.SOCKET_OUTBOX_STREAM,
+        {
+            "event": event,
+            "data": json.dumps(data),
+            "room": json.dumps(room),
+        },
+        maxlen=settings.SOCKET_OUTBOX_MAX_LENGTH,
+        approximate=True,
+    )
+
+
+emit_to_users_script = redis_client.register_script(emit_to_users_lua)
+
+
+async def emit_to_users(event: str, data, user_ids: List[int]):
+    # One event for the rooms of all the users, so it's published only once
+    # instead of once for every user.
+    # The event is also kept for every user until it's acknowledged, in case they are offline.
+    keys, args = emit_to_users_arguments(
+        event, data, user_ids, [get_user_room(user_id) for user_id in user_ids]
+    )
+    await emit_to_users_script(keys=keys, args=args)
+
+
+async def publish_outbox_events(events):
+    delivered = []
+    for event_id, fields in events:
+        if fields is None:
+            # The event was trimmed from the stream before it could be emitted.
+            delivered.append(event_id)
+            continue
+        data = json.loads(fields["data"])
+        if fields.get("queued"):
+            data = add_event_id(data, event_id)
+        try:
+            await sio.emit(
+                fields["event"],
+                data,
+                room=json.loads(fields["room"]),
+            )
+            delivered.append(event_id)
+        except Exception:
+            # Not acknowledging the event means it will be emitted again later.
+            logger.exception("Failed to emit outbox event %s", event_id)
+    if delivered:
+        await redis_client.xack(
+            settings.SOCKET_OUTBOX_STREAM, settings.SOCKET_OUTBOX_GROUP, *delivered
+        )
+
+
+async def run_outbox_publisher():
+    await create_consumer_group(settings.SOCKET_OUTBOX_STREAM, settings.SOCKET_OUTBOX_GROUP)
+    while True:
+        try:
+            events = await read_stream(
+                settings.SOCKET_OUTBOX_STREAM,
+                settings.SOCKET_OUTBOX_GROUP,
+                settings.SOCKET_OUTBOX_BATCH_SIZE,
+                settings.SOCKET_OUTBOX_BLOCK_MS,
+                settings.SOCKET_OUTBOX_RETRY_MS,
+            )
+            if events:
+                await publish_outbox_events(events)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Outbox publisher error")
+            await asyncio.sleep(1)
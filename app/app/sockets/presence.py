@@ -0,0 +1,56 @@
+import asyncio
+import logging
+from typing import List
+
+from app.config.config import settings
+from app.sockets.registry import get_user_sids, local_sids
+from app.util.redis_util import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+def presence_key(user_id: int):
+    return "presence_%s" % user_id
+
+
+async def set_online(user_id: int):
+    # The key expires if it's not refreshed, so a user can't stay online after a crash.
+    await redis_client.set(presence_key(user_id), 1, ex=settings.PRESENCE_TTL)
+
+
+async def set_offline(user_id: int):
+    # The user can still be connected on another device.
+    if not await get_user_sids(user_id):
+        await redis_client.delete(presence_key(user_id))
+
+
+async def get_online_users(user_ids: List[int]) -> List[int]:
+    # Check all the users in one round trip.
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for user_id in user_ids:
+            pipe.exists(presence_key(user_id))
+        online = await pipe.execute()
+    return [user_id for user_id, is_online in zip(user_ids, online) if is_online]
+
+
+async def refresh_presence():
+    # The users connected to this api instance are online. A connection that stops answering
+    # the pings of the server is disconnected, so the clients don't have to do anything.
+    user_ids = set(local_sids.values())
+    if not user_ids:
+        return
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for user_id in user_ids:
+            pipe.set(presence_key(user_id), 1, ex=settings.PRESENCE_TTL)
+        await pipe.execute()
+
+
+async def run_presence_refresh():
+    while True:
+        try:
+            await refresh_presence()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Presence refresh error")
+        await asyncio.sleep(settings.PRESENCE_TTL / 3)
@@ -0,0 +1,122 @@
+import asyncio
+from collections import defaultdict
+from contextvars import ContextVar
+
+import socketio
+
+from app.config.config import settings
+
+# The message that is being emitted, while the manager looks up who should receive it
+emitting_message: ContextVar = ContextVar("emitting_message", default=None)
+
+
+class QueueLimitedRedisManager(socketio.AsyncRedisManager):
+    """
+    Redis manager that keeps the outgoing queue of every connection bounded.
+    Events that can be missed are not sent to a connection with a full queue, only the
+    last one of every event is kept and sent when the queue is short again. A connection
+    that stays at the limit is disconnected.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.slow_strikes = defaultdict(int)
+        # sid -> event -> (namespace, data) of the events that are waiting for a short queue
+        self.coalesced = defaultdict(dict)
+        self.coalesced_events = 0
+        self.dropped_events = 0
+        self.evicted_connections = 0
+
+    def initialize(self):
+        super().initialize()
+        self.server.start_background_task(self._send_coalesced)
+
+    async def _handle_emit(self, message):
+        # Every emit, from this instance or from another one, is delivered from here.
+        token = emitting_message.set(message)
+        try:
+            await super()._handle_emit(message)
+        finally:
+            emitting_message.reset(token)
+
+    def get_queue_depth(self, eio_sid):
+        eio_socket = self.server.eio.sockets.get(eio_sid)
+        if eio_socket is None:
+            return 0
+        return eio_socket.queue.qsize()
+
+    def coalesce(self, sid, namespace, message):
+        # Only the last one is sent, the ones before it are dropped.
+        if message["event"] in self.coalesced[sid]:
+            self.dropped_events += 1
+        self.coalesced[sid][message["event"]] = (namespace, message["data"])
+        self.coalesced_events += 1
+
+    def get_participants(self, namespace, room):
+        message = emitting_message.get()
+        for sid, eio_sid in super().get_participants(namespace, room):
+            if message is None:
+                yield sid, eio_sid
+                continue
+
+            queue_depth = self.get_queue_depth(eio_sid)
+            droppable = message["event"] in settings.SOCKET_DROPPABLE_EVENTS
+            if queue_depth >= settings.SOCKET_QUEUE_HARD_LIMIT:
+                self.slow_strikes[sid] += 1
+                if self.slow_strikes[sid] == settings.SOCKET_SLOW_CONSUMER_STRIKES:
+                    # The client can't keep up, it can connect again and refresh.
+                    self.evicted_connections += 1
+                    asyncio.ensure_future(self.server.disconnect(sid, namespace=namespace))
+                if droppable:
+                    self.coalesce(sid, namespace, message)
+                    continue
+            elif queue_depth >= settings.SOCKET_QUEUE_SOFT_LIMIT:
+                # The strikes are only forgotten when the queue is short again.
+                if droppable:
+                    self.coalesce(sid, namespace, message)
+                    continue
+            else:
+                self.slow_strikes.pop(sid, None)
+            if droppable and sid in self.coalesced:
+                # This one is newer than the event that was waiting.
+                self.coalesced[sid].pop(message["event"], None)
+                if not self.coalesced[sid]:
+                    del self.coalesced[sid]
+            yield sid, eio_sid
+
+    async def _send_coalesced(self):
+        while True:
+            await self.server.sleep(settings.SOCKET_COALESCE_SECONDS)
+            for sid in list(self.coalesced):
+                events = self.coalesced[sid]
+                namespace = next(iter(events.values()))[0]
+                eio_sid = self.eio_sid_from_sid(sid, namespace)
+                if eio_sid is None:
+                    del self.coalesced[sid]
+                elif self.get_queue_depth(eio_sid) < settings.SOCKET_QUEUE_SOFT_LIMIT:
+                    del self.coalesced[sid]
+                    for event, (namespace, data) in events.items():
+                        try:
+                            # Only to this instance, the connection is here.
+                            await self.emit(
+                                event, data, namespace=namespace, to=sid, ignore_queue=True
+                            )
+                        except Exception:
+                            self._get_logger().exception("Failed to send coalesced %s", event)
+
+    async def disconnect(self, sid, namespace, **kwargs):
+        self.slow_strikes.pop(sid, None)
+        self.coalesced.pop(sid, None)
+        return await super().disconnect(sid, namespace, **kwargs)
+
+    def get_queue_stats(self):
+        queue_depths = [eio_socket.queue.qsize() for eio_socket in self.server.eio.sockets.values()]
+        return {
+            "connections": len(queue_depths),
+            "queued_packets": sum(queue_depths),
+            "max_queue_depth": max(queue_depths, default=0),
+            "slow_connections": len(self.slow_strikes),
+            "coalesced_events": self.coalesced_events,
+            "dropped_events": self.dropped_events,
+            "evicted_connections": self.evicted_connections,
+        }
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import uuid
+from typing import Dict, Optional
+
+from app.config.config import settings
+from app.util.redis_util import redis_client
+
+logger = logging.getLogger(__name__)
+
+# sid -> user id of all the authenticated socket connections, shared by all the api instances
+sid_user_key = "socket_sid_user"
+
+# The api instances that have socket connections. An instance that stops without cleaning
+# up, like after a crash, stops refreshing its key and its sids are removed by the others.
+nodes_key = "socket_nodes"
+node_id = uuid.uuid4().hex
+
+# sid -> user id of the socket connections of this api instance
+local_sids: Dict[str, int] = {}
+
+
+def user_sids_key(user_id: int):
+    # The sids of all the socket connections of a user
+    return "socket_user_sids_%s" % user_id
+
+
+def node_alive_key(node: str):
+    return "socket_node_alive_%s" % node
+
+
+def node_sids_key(node: str):
+    # sid -> user id of the socket connections of an api instance
+    return "socket_node_sids_%s" % node
+
+
+async def register_sid(sid: str, user_id: int):
+    local_sids[sid] = user_id
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.hset(sid_user_key, sid, user_id)
+        pipe.sadd(user_sids_key(user_id), sid)
+        pipe.hset(node_sids_key(node_id), sid, user_id)
+        await pipe.execute()
+
+
+async def unregister_sid(sid: str) -> Optional[int]:
+    local_sids.pop(sid, None)
+    user_id = await get_sid_user(sid)
+    if user_id is None:
+        return None
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.hdel(sid_user_key, sid)
+        pipe.srem(user_sids_key(user_id), sid)
+        pipe.hdel(node_sids_key(node_id), sid)
+        await pipe.execute()
+    return user_id
+
+
+async def get_sid_user(sid: str) -> Optional[int]:
+    user_id = await redis_client.hget(sid_user_key, sid)
+    if user_id is None:
+        return None
+    return int(user_id)
+
+
+async def get_user_sids(user_id: int) -> set:
+    return await redis_client.smembers(user_sids_key(user_id))
+
+
+async def remove_node_sids(node: str):
+    # Removes the sids of an api instance that has stopped.
+    node_sids = await redis_client.hgetall(node_sids_key(node))
+    async with redis_client.pipeline(transaction=True) as pipe:
+        for sid, user_id in node_sids.items():
+            pipe.hdel(sid_user_key, sid)
+            pipe.srem(user_sids_key(int(user_id)), sid)
+        pipe.delete(node_sids_key(node))
+        pipe.srem(nodes_key, node)
+        await pipe.execute()
+    if node_sids:
+        logger.info("Removed %s sids of stopped socket node %s", len(node_sids), node)
+
+
+async def refresh_node():
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.set(node_alive_key(node_id), 1, ex=settings.SOCKET_NODE_TTL)
+        pipe.sadd(nodes_key, node_id)
+        await pipe.execute()
+    for node in await redis_client.smembers(nodes_key):
+        if node != node_id and not await redis_client.exists(node_alive_key(node)):
+            await remove_node_sids(node)
+
+
+async def run_node_heartbeat():
+    # Also removes the sids of the stopped instances right away when starting.
+    while True:
+        try:
+            await refresh_node()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Socket node heartbeat error")
+        await asyncio.sleep(settings.SOCKET_NODE_HEARTBEAT)
@@ -1,41 +1,161 @@
+import logging
+from typing import Optional
+
 import socketio
 
 from app.config.config import settings
+from app.database import async_session
+from app.sockets.msgpack_manager import MsgPackRedisManager
+from app.sockets.offline_events import acknowledge_user_events, replay_user_events
+from app.sockets.presence import set_offline, set_online
+from app.sockets.queue_manager import QueueLimitedRedisManager
+from app.sockets.registry import register_sid, unregister_sid
+from app.util.log_util import correlation_id
+from app.util.util import check_token, get_auth_token
+
+logger = logging.getLogger(__name__)
 
-mgr = socketio.AsyncRedisManager(settings.REDIS_URI)
+if settings.SOCKET_MSGPACK:
+    mgr = MsgPackRedisManager(settings.REDIS_URI)
+    # A second server for the clients that use msgpack, with its own manager on the same
+    # redis channel. Whatever is emitted on one of the servers reaches the clients of both.
+    mgr_msgpack = MsgPackRedisManager(settings.REDIS_URI)
+    sio_msgpack = socketio.AsyncServer(
+        async_mode="asgi",
+        client_manager=mgr_msgpack,
+        cors_allowed_origins="*",
+        serializer="msgpack",
+    )
+    sio_msgpack_app = socketio.ASGIApp(
+        socketio_server=sio_msgpack, socketio_path="/socket.io-msgpack"
+    )
+else:
+    mgr = QueueLimitedRedisManager(settings.REDIS_URI)
+    sio_msgpack = None
+    sio_msgpack_app = None
 sio = socketio.AsyncServer(async_mode="asgi", client_manager=mgr, cors_allowed_origins="*")
-sio_app = socketio.ASGIApp(socketio_server=sio, socketio_path="/socket.io")
+sio_app = socketio.ASGIApp(
+    socketio_server=sio, other_asgi_app=sio_msgpack_app, socketio_path="/socket.io"
+)
+
+
+def get_socket_stats():
+    stats = mgr.get_queue_stats()
+    if sio_msgpack is not None:
+        stats_msgpack = mgr_msgpack.get_queue_stats()
+        for stat_name, value in stats_msgpack.items():
+            if stat_name == "max_queue_depth":
+                stats[stat_name] = max(stats[stat_name], value)
+            else:
+                stats[stat_name] += value
+    return stats
+
+
+def get_sid_server(sid) -> socketio.AsyncServer:
+    # The server that has the connection of this sid
+    if sio_msgpack is not None and sio_msgpack.manager.is_connected(sid, "/"):
+        return sio_msgpack
+    return sio
+
+
+def get_user_room(user_id: int):
+    return "room_%s" % user_id
+
+
+async def authenticate_socket(environ, auth) -> Optional[int]:
+    # The access token can be given in the auth data of the connection or as a header.
+    if auth and auth.get("access_token"):
+        auth_token = auth["access_token"]
+    else:
+        auth_token = get_auth_token(environ.get("HTTP_AUTHORIZATION"))
+    if auth_token == "":
+        return None
+
+    async with async_session() as db:
+        user = await check_token(db, auth_token)
+    if not user:
+        return None
+    return user.id
+
+
+async def get_session_user_id(sid) -> Optional[int]:
+    session = await get_sid_server(sid).get_session(sid)
+    return session.get("user_id")
 
 
 @sio.on("connect")
-async def handle_connect(sid, *args, **kwargs):
-    print(f"Received connect: {sid}")
-    # await sio.emit('lobby', 'User joined')
+async def handle_connect(sid, environ, auth=None):
+    correlation_id.set(sid)
+    logger.info("Received connect", extra={"event": "socket_connect", "sid": sid})
+    user_id = await authenticate_socket(environ, auth)
+    if user_id is None:
+        # Refusing the connection when authentication is required.
+        return not settings.SOCKET_REQUIRE_AUTH
+
+    server = get_sid_server(sid)
+    await server.save_session(sid, {"user_id": user_id})
+    await register_sid(sid, user_id)
+    await set_online(user_id)
+    await server.enter_room(sid, get_user_room(user_id))
 
 
 @sio.on("disconnect")
 async def handle_disconnect(sid, *args, **kwargs):
-    print(f"Received disconnect: {sid}")
-    # await sio.emit('lobby', 'User joined')
+    correlation_id.set(sid)
+    logger.info("Received disconnect", extra={"event": "socket_disconnect", "sid": sid})
+    user_id = await unregister_sid(sid)
+    if user_id is not None:
+        await set_offline(user_id)
+
+
+@sio.on("heartbeat")
+async def handle_heartbeat(sid, *args, **kwargs):
+    # The server keeps the connected users online, a client can also refresh it right away.
+    user_id = await get_session_user_id(sid)
+    if user_id is not None:
+        await set_online(user_id)
 
 
 @sio.on("message_event")
 async def handle_message_event(sid, *args, **kwargs):
-    print(f"Received message_event: {sid}")
+    correlation_id.set(sid)
+    logger.info("Received message_event", extra={"event": "socket_message_event", "sid": sid})
 
 
 @sio.on("join")
 async def handle_join(sid, *args, **kwargs):
     data = args[0]
     user_id = data["user_id"]
+    session_user_id = await get_session_user_id(sid)
+    if session_user_id is not None and session_user_id != user_id:
+        # An authenticated connection can only join the room of its own user.
+        return
+    if session_user_id is None and settings.SOCKET_REQUIRE_AUTH:
+        return
     if user_id != -1:
-        room = "room_%s" % user_id
-        await sio.enter_room(sid, room)
-        await sio.emit(
+        room = get_user_room(user_id)
+        server = get_sid_server(sid)
+        await server.enter_room(sid, room)
+        await server.emit(
             "message_event",
             "User has entered room %s" % room,
             room=room,
         )
+        if session_user_id is not None:
+            await replay_user_events(server, sid, session_user_id)
+
+
+@sio.on("ack_event")
+async def handle_ack_event(sid, *args, **kwargs):
+    # The client acknowledges the events it received, so they are not replayed again.
+    data = args[0] if args else None
+    event_id = data.get("event_id") if isinstance(data, dict) else None
+    if not isinstance(event_id, str):
+        # A malformed acknowledgement is ignored.
+        return
+    user_id = await get_session_user_id(sid)
+    if user_id is not None:
+        await acknowledge_user_events(user_id, event_id)
 
 
 @sio.on("leave")
@@ -43,10 +163,17 @@ async def handle_leave(sid, *args, **kwargs):
     data = args[0]
     user_id = data["user_id"]
     if user_id != -1:
-        room = "room_%s" % user_id
-        await sio.leave_room(sid, room)
-        await sio.emit(
+        room = get_user_room(user_id)
+        server = get_sid_server(sid)
+        await server.leave_room(sid, room)
+        await server.emit(
             "message_event",
             "User has left room %s" % room,
             room=sid,
         )
+
+
+if sio_msgpack is not None:
+    # The msgpack clients are handled exactly the same.
+    for event, handler in sio.handlers["/"].items():
+        sio_msgpack.on(event, handler)
@@ -0,0 +1,89 @@
+import asyncio
+import re
+from collections import Counter
+from datetime import datetime
+from typing import List
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.models import AvatarBlob, User
+from app.util.avatar.avatar_cache import avatar_cache
+from app.util.avatar.avatar_store import avatar_store
+from app.util.avatar.process_avatar import AvatarImage, avatar_process_executor, avatar_webp_path
+
+avatar_hash_pattern = re.compile(r"^[0-9a-f]{64}$")
+
+
+def store_avatar_blobs(avatar_images: List[AvatarImage]):
+    # An image that is already stored by someone else is not written again.
+    for avatar_image in avatar_images:
+        file_path = AvatarBlob.file_path(avatar_image.hash)
+        if not avatar_store.exists(file_path):
+            avatar_store.write(file_path, avatar_image.png)
+        if avatar_image.webp is not None and not avatar_store.exists(avatar_webp_path(file_path)):
+            avatar_store.write(avatar_webp_path(file_path), avatar_image.webp)
+
+
+async def store_avatar_blobs_async(avatar_images: List[AvatarImage]):
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(avatar_process_executor, store_avatar_blobs, avatar_images)
+
+
+def remove_avatar_files(file_paths: List[str]):
+    for file_path in file_paths:
+        for path in [file_path, avatar_webp_path(file_path)]:
+            avatar_store.remove(path)
+            avatar_cache.invalidate(path)
+
+
+async def remove_avatar_files_async(file_paths: List[str]):
+    if not file_paths:
+        return
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(avatar_process_executor, remove_avatar_files, file_paths)
+
+
+def avatar_blob_ref_statement(avatar_hash: str, change: int):
+    # Also makes the blob when it's the first reference.
+    values = {"ref_count": AvatarBlob.ref_count + change}
+    if change < 0:
+        values["released_at"] = datetime.utcnow()
+    return (
+        insert(AvatarBlob)
+        .values(hash=avatar_hash, ref_count=change)
+        .on_conflict_do_update(index_elements=[AvatarBlob.hash], set_=values)
+    )
+
+
+def avatar_blob_changes(user, avatar_hashes: List[str]):
+    changes = Counter(avatar_hashes)
+    changes.subtract(
+        [avatar_hash for avatar_hash in [user.avatar_hash, user.avatar_hash_small] if avatar_hash]
+    )
+    # Always in the same order, so two transactions don't wait on each other's blobs.
+    return sorted((avatar_hash, change) for avatar_hash, change in changes.items() if change)
+
+
+async def set_avatar_blobs(db: AsyncSession, user, avatar_hashes: List[str]) -> List[str]:
+    # The full and small avatar hashes, or nothing for the default avatar. The reference
+    # counts are changed in the same transaction as the user, the caller commits.
+    # The user is locked and read again first, so when the avatar is changed twice at the
+    # same time the second change starts from the hashes of the first.
+    lock_statement = (
+        select(User)
+        .where(User.id == user.id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    await db.execute(lock_statement)
+    # The older custom avatar files, to remove after the commit.
+    legacy_avatar_paths = user.legacy_avatar_paths()
+    for avatar_hash, change in avatar_blob_changes(user, avatar_hashes):
+        await db.execute(avatar_blob_ref_statement(avatar_hash, change))
+    if avatar_hashes:
+        user.avatar_hash, user.avatar_hash_small = avatar_hashes
+    else:
+        user.avatar_hash, user.avatar_hash_small = None, None
+    return legacy_avatar_paths
@@ -0,0 +1,115 @@
+import base64
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from app.config.config import settings
+from app.util.avatar.avatar_store import avatar_store
+
+
+class AvatarCacheEntry:
+    def __init__(self, data: bytes, version: Hashable):
+        self.data = data
+        self.version = version
+        self.checked = time.monotonic()
+        self._base64 = None
+
+    @property
+    def base64(self) -> str:
+        # Only encoded when it's needed, the image endpoint only uses the bytes.
+        if self._base64 is None:
+            self._base64 = base64.encodebytes(self.data).decode()
+        return self._base64
+
+    @property
+    def memory(self) -> int:
+        return len(self.data) + (len(self._base64) if self._base64 is not None else 0)
+
+
+class AvatarCache:
+    """
+    Least recently used cache of the avatar files, bounded by the total size in bytes.
+    An entry is checked against the version in the avatar store at most every
+    AVATAR_CACHE_CHECK_SECONDS, changes made on this server invalidate it right away.
+    """
+
+    def __init__(self, max_bytes: int, check_seconds: float):
+        self.max_bytes = max_bytes
+        self.check_seconds = check_seconds
+        self.entries: "OrderedDict[str, AvatarCacheEntry]" = OrderedDict()
+        self.total_bytes = 0
+        # The avatars can also be loaded from a thread pool.
+        self.lock = threading.Lock()
+
+    def _load(self, file_path: str) -> Optional[AvatarCacheEntry]:
+        with self.lock:
+            entry = self.entries.get(file_path)
+            if entry is not None:
+                self.entries.move_to_end(file_path)
+                if time.monotonic() - entry.checked < self.check_seconds:
+                    return entry
+
+        version = avatar_store.version(file_path)
+        if version is None:
+            self.invalidate(file_path)
+            return None
+        if entry is not None and entry.version == version:
+            entry.checked = time.monotonic()
+            return entry
+
+        data = avatar_store.read(file_path)
+        if data is None:
+            self.invalidate(file_path)
+            return None
+        entry = AvatarCacheEntry(data, version)
+        self._store(file_path, entry)
+        return entry
+
+    def _store(self, file_path: str, entry: AvatarCacheEntry):
+        with self.lock:
+            old_entry = self.entries.pop(file_path, None)
+            if old_entry is not None:
+                self.total_bytes -= old_entry.memory
+            self.entries[file_path] = entry
+            self.total_bytes += entry.memory
+            self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self.entries:
+            _, evicted = self.entries.popitem(last=False)
+            self.total_bytes -= evicted.memory
+
+    def get(self, file_path: str) -> Optional[bytes]:
+        entry = self._load(file_path)
+        return entry.data if entry is not None else None
+
+    def get_base64(self, file_path: str) -> Optional[str]:
+        entry = self._load(file_path)
+        if entry is None:
+            return None
+        with self.lock:
+            before = entry.memory
+            encoded = entry.base64
+            if self.entries.get(file_path) is entry:
+                self.total_bytes += entry.memory - before
+                self._evict()
+        return encoded
+
+    def peek(self, file_path: str) -> Optional[bytes]:
+        # The bytes if they are cached and still valid, without reading the file.
+        with self.lock:
+            entry = self.entries.get(file_path)
+            if entry is None or time.monotonic() - entry.checked >= self.check_seconds:
+                return None
+            self.entries.move_to_end(file_path)
+            return entry.data
+
+    def invalidate(self, file_path: str):
+        with self.lock:
+            entry = self.entries.pop(file_path, None)
+            if entry is not None:
+                self.total_bytes -= entry.memory
+
+
+avatar_cache = AvatarCache(settings.AVATAR_CACHE_MAX_BYTES, settings.AVATAR_CACHE_CHECK_SECONDS)
@@ -0,0 +1,43 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from app.config.config import settings
+from app.util.avatar.avatar_cache import avatar_cache
+from app.util.avatar.default_avatar import generate_default_avatar
+
+avatar_executor = ThreadPoolExecutor(
+    max_workers=settings.AVATAR_LOADER_THREADS, thread_name_prefix="avatar_loader"
+)
+
+
+def load_avatar_chunk(avatars: List[Tuple[str, Optional[str]]]) -> List[Optional[str]]:
+    avatars_base64 = []
+    for file_path, default_file_name in avatars:
+        avatar = avatar_cache.get_base64(file_path)
+        if avatar is None and default_file_name is not None:
+            # The default avatar is generated the first time it's needed.
+            generate_default_avatar(default_file_name)
+            avatar = avatar_cache.get_base64(file_path)
+        avatars_base64.append(avatar)
+    return avatars_base64
+
+
+async def load_avatars(users: List, full: bool = True) -> Dict[int, Optional[str]]:
+    # Loads the base64 of the avatars of the users in the thread pool, so the event loop is
+    # not blocked by the file reads. The users are split over at most one job per thread.
+    if not settings.AVATAR_INLINE or not users:
+        return {}
+    avatars = [
+        (user.avatar_path(full), user.avatar_filename() if user.is_default() else None)
+        for user in users
+    ]
+    chunk_size = -(-len(avatars) // settings.AVATAR_LOADER_THREADS)
+    chunks = [avatars[i : i + chunk_size] for i in range(0, len(avatars), chunk_size)]
+
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(
+        *[loop.run_in_executor(avatar_executor, load_avatar_chunk, chunk) for chunk in chunks]
+    )
+    avatars_base64 = [avatar for chunk_avatars in results for avatar in chunk_avatars]
+    return {user.id: avatar for user, avatar in zip(users, avatars_base64)}
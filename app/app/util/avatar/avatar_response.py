@@ -0,0 +1,44 @@
+from fastapi import Request, Response, status
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.config.config import settings
+from app.util.avatar.avatar_cache import avatar_cache
+from app.util.avatar.avatar_store import avatar_store
+from app.util.avatar.process_avatar import avatar_webp_path
+
+
+async def avatar_response(request: Request, file_path: str, etag: str) -> Response:
+    # The avatar image for a url that never changes, so it can be cached forever.
+    image_format = "png"
+    if settings.AVATAR_WEBP and "image/webp" in request.headers.get("Accept", ""):
+        # Uploaded avatars also have a smaller webp version.
+        webp_path = avatar_webp_path(file_path)
+        if avatar_cache.peek(webp_path) is not None or avatar_store.exists(webp_path):
+            file_path = webp_path
+            image_format = "webp"
+    media_type = "image/%s" % image_format
+
+    etag = '"%s-%s"' % (etag, image_format)
+    headers = {
+        "Cache-Control": "public, max-age=%s, immutable" % settings.AVATAR_CACHE_MAX_AGE,
+        "ETag": etag,
+        "Vary": "Accept",
+    }
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    avatar = avatar_cache.peek(file_path)
+    if avatar is not None:
+        # A hot avatar is sent from memory.
+        return Response(avatar, media_type=media_type, headers=headers)
+    if not avatar_store.serves_files:
+        # A slice of the memory-mapped pack, read in a thread in case it's not in memory yet.
+        avatar = await run_in_threadpool(avatar_cache.get, file_path)
+        if avatar is None:
+            return Response(status_code=status.HTTP_404_NOT_FOUND)
+        return Response(avatar, media_type=media_type, headers=headers)
+    if not avatar_store.exists(file_path):
+        # This should not be cached, the avatar might be there later.
+        return Response(status_code=status.HTTP_404_NOT_FOUND)
+    return FileResponse(file_path, media_type=media_type, headers=headers)
@@ -0,0 +1,400 @@
+import fcntl
+import glob
+import mmap
+import os
+import stat
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from app.config.config import settings
+
+
+class FileAvatarStore:
+    """
+    Every avatar is a separate file, the avatars are named by their file path.
+    """
+
+    # The avatar files can be sent as they are.
+    serves_files = True
+
+    def version(self, file_path: str) -> Optional[Tuple[int, int]]:
+        try:
+            file_stat = os.stat(file_path)
+        except OSError:
+            return None
+        return file_stat.st_mtime_ns, file_stat.st_size
+
+    def exists(self, file_path: str) -> bool:
+        return os.path.isfile(file_path)
+
+    def read(self, file_path: str) -> Optional[bytes]:
+        try:
+            with open(file_path, "rb") as fd:
+                return fd.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, file_path: str, data: bytes):
+        # Written to a temporary file first, so the avatar is never read while half written.
+        file_descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "wb") as fd:
+                fd.write(data)
+            os.chmod(temp_path, stat.S_IRWXO)
+            os.replace(temp_path, file_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def remove(self, file_path: str):
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
+
+class PackEntry(NamedTuple):
+    pack: int
+    offset: int
+    length: int
+    version: int
+    written_ns: int
+
+
+# An index record is the header followed by the name of the avatar. A record with
+# length 0 means the avatar was removed.
+record_header = struct.Struct("<HIQIIQ")
+
+
+class PackAvatarStore:
+    """
+    The avatars are appended to large pack files and found with an index, so there is no
+    directory with millions of files and no file to open for every avatar. The avatars are
+    read as slices of the memory-mapped packs.
+
+    The index is an append-only file of records with the pack, offset, length and version of
+    an avatar. Every server keeps the index in memory and reads the records that were added
+    by others. Writes are done while holding a file lock, so the servers and the worker
+    processes can share the packs. A replaced avatar stays in its pack until compact is run,
+    which copies the avatars that are still used to new packs and replaces the index.
+
+    The avatars are still named by their file path, only the file name is used as the key.
+    """
+
+    # The avatars are read from the packs, there is no file to send.
+    serves_files = False
+
+    def __init__(self, folder: str, max_pack_bytes: int, refresh_seconds: float):
+        self.folder = folder
+        self.max_pack_bytes = max_pack_bytes
+        self.refresh_seconds = refresh_seconds
+        self.index_path = os.path.join(folder, "index")
+        # Guards the index in memory, the avatars can also be read from a thread pool.
+        self.lock = threading.RLock()
+        # Only one thread of this process writes at a time, the file lock is for the others.
+        self.write_lock = threading.Lock()
+        self._reset()
+        self.refreshed = 0.0
+
+    def _reset(self):
+        self.entries: Dict[str, PackEntry] = {}
+        self.maps: Dict[int, mmap.mmap] = {}
+        self.index_inode = None
+        self.index_offset = 0
+        self.max_pack = 0
+        self.last_version = 0
+
+    def _pack_path(self, pack: int) -> str:
+        return os.path.join(self.folder, "avatars_%s.pack" % pack)
+
+    def _apply(self, data: bytes) -> int:
+        # Returns how much was read, a record that is still being written is read next time.
+        offset = 0
+        while offset + record_header.size <= len(data):
+            key_length, pack, pack_offset, length, version, written_ns = record_header.unpack_from(
+                data, offset
+            )
+            end = offset + record_header.size + key_length
+            if end > len(data):
+                break
+            key = data[offset + record_header.size : end].decode("utf-8")
+            self.last_version = max(self.last_version, version)
+            self.max_pack = max(self.max_pack, pack)
+            if length == 0:
+                self.entries.pop(key, None)
+            else:
+                self.entries[key] = PackEntry(pack, pack_offset, length, version, written_ns)
+            offset = end
+        return offset
+
+    def _refresh(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self.refreshed < self.refresh_seconds:
+            return
+        self.refreshed = now
+        try:
+            index_stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            if self.index_inode is not None:
+                self._reset()
+            return
+        if index_stat.st_ino == self.index_inode and index_stat.st_size == self.index_offset:
+            return
+        with open(self.index_path, "rb") as index_file:
+            inode = os.fstat(index_file.fileno()).st_ino
+            if inode != self.index_inode:
+                # The index was replaced by a compaction, it's read again from the start.
+                self._reset()
+                self.index_inode = inode
+            index_file.seek(self.index_offset)
+            data = index_file.read()
+        self.index_offset += self._apply(data)
+
+    def _lookup(self, key: str, force: bool = False) -> Optional[PackEntry]:
+        with self.lock:
+            self._refresh(force)
+            entry = self.entries.get(key)
+            if entry is None and not force:
+                # It might just have been written by another server.
+                self._refresh(True)
+                entry = self.entries.get(key)
+            return entry
+
+    def _slice(self, entry: PackEntry) -> bytes:
+        with self.lock:
+            pack_map = self.maps.get(entry.pack)
+            if pack_map is None or len(pack_map) < entry.offset + entry.length:
+                # Mapped again when the pack has grown since.
+                with open(self._pack_path(entry.pack), "rb") as pack_file:
+                    pack_map = mmap.mmap(pack_file.fileno(), 0, access=mmap.ACCESS_READ)
+                self.maps[entry.pack] = pack_map
+        return pack_map[entry.offset : entry.offset + entry.length]
+
+    def entry(self, file_path: str) -> Optional[PackEntry]:
+        return self._lookup(os.path.basename(file_path))
+
+    def version(self, file_path: str) -> Optional[int]:
+        entry = self.entry(file_path)
+        return entry.version if entry is not None else None
+
+    def exists(self, file_path: str) -> bool:
+        return self.entry(file_path) is not None
+
+    def read(self, file_path: str) -> Optional[bytes]:
+        key = os.path.basename(file_path)
+        entry = self._lookup(key)
+        if entry is None:
+            return None
+        try:
+            return self._slice(entry)
+        except FileNotFoundError:
+            # The pack was removed by a compaction, the index has changed as well.
+            entry = self._lookup(key, force=True)
+            return self._slice(entry) if entry is not None else None
+
+    @contextmanager
+    def _locked(self):
+        with self.write_lock:
+            os.makedirs(self.folder, exist_ok=True)
+            with open(os.path.join(self.folder, "lock"), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    with self.lock:
+                        self._refresh(True)
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _pack_numbers(self) -> List[int]:
+        return [
+            int(os.path.basename(pack_path)[len("avatars_") : -len(".pack")])
+            for pack_path in glob.glob(os.path.join(self.folder, "avatars_*.pack"))
+        ]
+
+    def _create_pack(self) -> int:
+        # A new pack gets a number that no pack has yet, also when a compaction or another
+        # process makes a pack at the same time.
+        while True:
+            pack = max(self._pack_numbers() + [self.max_pack]) + 1
+            try:
+                open(self._pack_path(pack), "xb").close()
+                return pack
+            except FileExistsError:
+                continue
+
+    def _append_packs(
+        self, avatars: Iterable[Tuple[bytes, int]], pack: int
+    ) -> Tuple[List[Tuple[int, int]], int]:
+        # Appends the avatars to the packs, starting with the given pack, and returns where
+        # they are and the last pack. The packs are synced before the index points to them.
+        locations = []
+        pack_file = open(self._pack_path(pack), "ab")
+        try:
+            size = pack_file.seek(0, os.SEEK_END)
+            for data, length in avatars:
+                if size > 0 and size + length > self.max_pack_bytes:
+                    pack_file.flush()
+                    os.fsync(pack_file.fileno())
+                    pack_file.close()
+                    pack = self._create_pack()
+                    pack_file = open(self._pack_path(pack), "ab")
+                    size = 0
+                pack_file.write(data)
+                locations.append((pack, size))
+                size += length
+            pack_file.flush()
+            os.fsync(pack_file.fileno())
+        finally:
+            pack_file.close()
+        return locations, pack
+
+    def _write_index(self, index_file, records: bytes):
+        index_file.write(records)
+        index_file.flush()
+        os.fsync(index_file.fileno())
+
+    def write_many(self, avatars: List[Tuple[str, bytes, Optional[int]]]):
+        # The file path, the image and optionally when it was written, in nanoseconds.
+        if not avatars:
+            return
+        with self._locked():
+            locations, _ = self._append_packs(
+                [(data, len(data)) for _, data, _ in avatars], max(self.max_pack, 1)
+            )
+            records = []
+            version = self.last_version
+            for (file_path, data, written_ns), (pack, offset) in zip(avatars, locations):
+                key = os.path.basename(file_path).encode("utf-8")
+                version += 1
+                records.append(
+                    record_header.pack(
+                        len(key), pack, offset, len(data), version, written_ns or time.time_ns()
+                    )
+                    + key
+                )
+            with open(self.index_path, "ab") as index_file:
+                self._write_index(index_file, b"".join(records))
+            with self.lock:
+                self._refresh(True)
+
+    def write(self, file_path: str, data: bytes):
+        self.write_many([(file_path, data, None)])
+
+    def remove(self, file_path: str):
+        key = os.path.basename(file_path)
+        with self._locked():
+            if key not in self.entries:
+                return
+            key_bytes = key.encode("utf-8")
+            record = record_header.pack(len(key_bytes), 0, 0, 0, self.last_version + 1, 0)
+            with open(self.index_path, "ab") as index_file:
+                self._write_index(index_file, record + key_bytes)
+            with self.lock:
+                self._refresh(True)
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            self._refresh(True)
+            live_bytes = sum(entry.length for entry in self.entries.values())
+            avatars = len(self.entries)
+        pack_bytes = sum(
+            os.path.getsize(pack_path)
+            for pack_path in glob.glob(os.path.join(self.folder, "avatars_*.pack"))
+        )
+        return {"avatars": avatars, "live_bytes": live_bytes, "pack_bytes": pack_bytes}
+
+    def _copy_entries(
+        self, entries: List[Tuple[str, PackEntry]], pack: int
+    ) -> Tuple[Dict[str, PackEntry], int]:
+        # Copies the avatars to the packs of the compaction, in the order they are in now.
+        entries = sorted(entries, key=lambda item: item[1][:2])
+        locations, pack = self._append_packs(
+            ((self._slice(entry), entry.length) for _, entry in entries), pack
+        )
+        copied = {
+            key: entry._replace(pack=location[0], offset=location[1])
+            for (key, entry), location in zip(entries, locations)
+        }
+        return copied, pack
+
+    def compact(self):
+        # The avatars that are still used are copied to new packs and the index is replaced
+        # by one with only those avatars. The copy is made without the write lock, so the
+        # servers can keep writing. Only what was written during the copy is copied with the
+        # lock, before the index is replaced. The old packs are removed after, a server that
+        # still has one mapped can keep reading from it.
+        os.makedirs(self.folder, exist_ok=True)
+        with open(os.path.join(self.folder, "compact.lock"), "w") as compact_lock_file:
+            try:
+                fcntl.flock(compact_lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise RuntimeError("The avatar packs are already being compacted")
+            try:
+                self._compact()
+            finally:
+                fcntl.flock(compact_lock_file, fcntl.LOCK_UN)
+
+    def _compact(self):
+        with self._locked():
+            with self.lock:
+                snapshot = dict(self.entries)
+            # The packs of the compaction are not in the index, nobody else writes to them.
+            first_pack = self._create_pack()
+        copied, pack = self._copy_entries(list(snapshot.items()), first_pack)
+        compaction_packs = set(range(first_pack, pack + 1))
+
+        with self._locked():
+            with self.lock:
+                entries = dict(self.entries)
+            changed = [(key, entry) for key, entry in entries.items() if snapshot.get(key) != entry]
+            changed_copied, pack = self._copy_entries(changed, pack)
+            copied.update(changed_copied)
+            compaction_packs.update(range(first_pack, pack + 1))
+
+            records = []
+            for key in entries:
+                entry = copied[key]
+                key_bytes = key.encode("utf-8")
+                records.append(
+                    record_header.pack(
+                        len(key_bytes),
+                        entry.pack,
+                        entry.offset,
+                        entry.length,
+                        entry.version,
+                        entry.written_ns,
+                    )
+                    + key_bytes
+                )
+            file_descriptor, temp_path = tempfile.mkstemp(dir=self.folder, suffix=".tmp")
+            try:
+                with os.fdopen(file_descriptor, "wb") as index_file:
+                    self._write_index(index_file, b"".join(records))
+                os.replace(temp_path, self.index_path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+            # Also the packs that were started by the servers during the copy, everything
+            # in them is copied as well.
+            for old_pack in set(self._pack_numbers()) - compaction_packs:
+                os.remove(self._pack_path(old_pack))
+            with self.lock:
+                self._reset()
+                self._refresh(True)
+
+
+def get_avatar_store():
+    if settings.AVATAR_STORE == "pack":
+        return PackAvatarStore(
+            settings.AVATAR_PACK_FOLDER,
+            settings.AVATAR_PACK_MAX_BYTES,
+            settings.AVATAR_PACK_REFRESH_SECONDS,
+        )
+    return FileAvatarStore()
+
+
+avatar_store = get_avatar_store()
@@ -0,0 +1,67 @@
+import asyncio
+import fcntl
+import logging
+import os
+import threading
+from typing import Dict
+from zlib import crc32
+
+from app.config.config import settings
+from app.util.avatar.avatar_cache import avatar_cache
+from app.util.avatar.avatar_store import avatar_store
+from app.util.avatar.generate_avatar import generate_avatar
+from app.util.avatar.process_avatar import avatar_process_executor
+
+logger = logging.getLogger(__name__)
+
+# The locks are shared by the avatars with the same stripe, instead of one lock per avatar.
+lock_stripes = 64
+thread_locks = [threading.Lock() for _ in range(lock_stripes)]
+
+# The default avatars that are being generated in this process.
+generating: Dict[str, asyncio.Future] = {}
+
+
+def default_avatar_path(file_name: str) -> str:
+    return os.path.join(settings.UPLOAD_FOLDER_AVATARS, "%s_default.png" % file_name)
+
+
+def generate_default_avatar(file_name: str):
+    # The default avatar is only generated the first time it's needed. The generator always
+    # makes the same avatar for the same file name, so it's generated only once, even when
+    # it's requested at the same time in different threads or on different servers.
+    file_path = default_avatar_path(file_name)
+    if avatar_store.exists(file_path):
+        return
+    stripe = crc32(file_name.encode("utf-8")) % lock_stripes
+    lock_folder = os.path.join(settings.UPLOAD_FOLDER_AVATARS, ".locks")
+    os.makedirs(lock_folder, exist_ok=True)
+    with thread_locks[stripe]:
+        with open(os.path.join(lock_folder, "%s.lock" % stripe), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if not avatar_store.exists(file_path):
+                    generate_avatar(file_name, settings.UPLOAD_FOLDER_AVATARS)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+async def ensure_default_avatar(user):
+    # Makes sure the default avatar of the user exists, without blocking the event loop.
+    if not user.is_default():
+        return
+    if avatar_cache.peek(user.avatar_path()) is not None:
+        return
+
+    # Whether the avatar exists is checked in the thread pool, the store reads a file.
+    file_name = user.avatar_filename()
+    future = generating.get(file_name)
+    if future is None:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(avatar_process_executor, generate_default_avatar, file_name)
+        generating[file_name] = future
+        future.add_done_callback(lambda _: generating.pop(file_name, None))
+    try:
+        await asyncio.shield(future)
+    except Exception:
+        logger.exception("Generating the default avatar of user %s failed", user.id)
@@ -1,9 +1,16 @@
+import io
 import math
 import os
 import random
-import stat
 
-from PIL import Image, ImageDraw
+from PIL import Image, ImageDraw, UnidentifiedImageError
+from PIL.PngImagePlugin import PngInfo
+
+from app.util.avatar.process_avatar import save_avatar
+
+# Bump this when a change to the generator changes the avatars, regenerate_avatars.py then
+# makes the avatars of the older versions again. It's stored in the avatar png.
+GENERATOR_VERSION = 1
 
 angles = [83, 84, 85, 86, 94, 95, 96, 97]
 min_line_length = 20
@@ -40,6 +47,9 @@ class Line:
         self.start = start
         self.end = end
         self.next = None
+        # The points of a line don't change, so the length is only calculated once.
+        self.length = get_length(start, end)
+        self.slope = None
 
     def set_next(self, line):
         self.next = line
@@ -48,9 +58,12 @@ class Line:
         return self.next
 
     def get_length(self):
-        x_length = abs(self.start[0] - self.end[0])
-        y_length = abs(self.start[1] - self.end[1])
-        return math.sqrt(math.pow(x_length, 2) + math.pow(y_length, 2))
+        return self.length
+
+    def get_slope(self):
+        if self.slope is None:
+            self.slope = slope_line(self.start, self.end)
+        return self.slope
 
 
 class Plane:
@@ -83,9 +96,7 @@ class Plane:
 
 def get_angle_lines(line_1, line_2):
     # https://stackoverflow.com/questions/28260962/calculating-angles-between-line-segments-python-with-math-atan2
-    slope1 = slope_line(line_1.start, line_1.end)
-    slope2 = slope_line(line_2.start, line_2.end)
-    return angle_slopes(slope1, slope2)
+    return angle_slopes(line_1.get_slope(), line_2.get_slope())
 
 
 def slope_line(point_1, point_2):
@@ -113,10 +124,7 @@ def angle_slopes(slope_1, slope_2):
 
 
 def point_on_line(_line, _point):
-    segment_1 = Line(_line.start, _point)
-    segment_2 = Line(_point, _line.end)
-
-    segments_length = segment_1.get_length() + segment_2.get_length()
+    segments_length = get_length(_line.start, _point) + get_length(_point, _line.end)
     # Damn floating points!
     if abs(_line.get_length() - segments_length) <= 0.001:
         return True
@@ -210,16 +218,15 @@ def add_square_clean(_rand, _width, _height, _planes, _index):
         ang_3 = get_angle_lines(next_line, next_line.get_next())
         ang_4 = 360 - ang_1 - ang_2 - ang_3
 
-        triangle_1_line_2 = Line(next_line.start, next_line.end)
         triangle_1_line_3 = Line(next_line.end, test_point_b_1)
 
-        triangle_1_ang_3 = get_angle_lines(triangle_1_line_2, triangle_1_line_3)
+        triangle_1_ang_3 = get_angle_lines(next_line, triangle_1_line_3)
 
         t2_ang_1 = ang_3 - triangle_1_ang_3
         t2_ang_2 = ang_4
         t2_ang_3 = 180 - t2_ang_1 - t2_ang_2
 
-        t2_mid = Line(next_line.end, test_point_b_1).get_length()
+        t2_mid = triangle_1_line_3.get_length()
         t2_side = (t2_mid * math.sin(math.radians(t2_ang_3))) / math.sin(math.radians(t2_ang_2))
 
         change_line = next_line.get_next()
@@ -326,12 +333,11 @@ def background_square_clean(_rand, _width, _height, _index):
     return background_plane
 
 
-def generate_avatar(file_name, file_path):
+def draw_avatar(file_name):
     # Code repurposed from https://github.com/Grabot/Stijl
-    # The email hash will be the seed of the avatar generation
-    random.seed(file_name)
-    # Because this will be the default image we will add an indicator that it is the default.
-    file_name += "_default"
+    # The email hash will be the seed of the avatar generation. The avatars are generated
+    # in threads, so every avatar has its own generator instead of the global one.
+    rng = random.Random(file_name)
     planes = []
     # Add an index so that we can pick new colours from the same list
     # using the same seed and get a new one every time.
@@ -340,16 +346,16 @@ def generate_avatar(file_name, file_path):
     # We initially make it slightly bigger to avoid black corners on the image from outer lines
     width = 252
     height = 252
-    background_plane = background_square_clean(random, width, height, index)
+    background_plane = background_square_clean(rng, width, height, index)
     index += 1
     planes.append(background_plane)
 
     min_squares = 15
     max_squares = 30
-    square_numbers = random.randint(min_squares, max_squares)
+    square_numbers = rng.randint(min_squares, max_squares)
 
     for x in range(0, square_numbers):
-        plane_1, plane_2, chosen_plane = add_square_clean(random, width, height, planes, index)
+        plane_1, plane_2, chosen_plane = add_square_clean(rng, width, height, planes, index)
         if plane_1 is None and plane_2 is None and chosen_plane is None:
             break
         else:
@@ -357,7 +363,16 @@ def generate_avatar(file_name, file_path):
             planes.append(plane_1)
             planes.append(plane_2)
 
-    im = Image.new("RGBA", (width * 2, height * 2))
+    bound_x = int(width / 2) + 1
+    bound_y = int(height / 2) + 1
+    # subtract 2 again to make it 250x250
+    box = (bound_x, bound_y, bound_x + width - 2, bound_y + height - 2)
+
+    # The planes are drawn around the center of a canvas of twice the size and the middle
+    # is cropped. Nothing right or below the crop is used, so the canvas stops there.
+    # The points are not moved to draw only the crop, because the rounding of the
+    # moved points would give slightly different pixels.
+    im = Image.new("RGBA", (box[2], box[3]))
     draw = ImageDraw.Draw(im, "RGBA")
     for plane in planes:
         points = []
@@ -368,12 +383,23 @@ def generate_avatar(file_name, file_path):
 
     del draw
 
-    bound_x = int(width / 2) + 1
-    bound_y = int(height / 2) + 1
-    # subtract 2 again to make it 250x250
-    box = (bound_x, bound_y, bound_x + width - 2, bound_y + height - 2)
-    im2 = im.crop(box)
+    return im.crop(box)
+
 
-    file = os.path.join(file_path, "%s.png" % file_name)
-    im2.save(file)
-    os.chmod(file, stat.S_IRWXO)
+def generate_avatar(file_name, file_path):
+    im2 = draw_avatar(file_name)
+    # Because this will be the default image we will add an indicator that it is the default.
+    file = os.path.join(file_path, "%s_default.png" % file_name)
+    png_info = PngInfo()
+    png_info.add_text("generator_version", str(GENERATOR_VERSION))
+    # Written to a temporary file first, the avatar can be requested while it's generated.
+    save_avatar(im2, file, pnginfo=png_info)
+
+
+def avatar_generator_version(data: bytes) -> int:
+    # Only the header is read. The avatars from before the version was stored are version 1.
+    try:
+        version = Image.open(io.BytesIO(data), formats=["PNG"]).info.get("generator_version")
+    except UnidentifiedImageError:
+        return 0
+    return int(version) if version is not None and version.isdigit() else 1
@@ -0,0 +1,118 @@
+import asyncio
+import base64
+import binascii
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from typing import List, NamedTuple, Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+from PIL.PngImagePlugin import PngInfo
+
+from app.config.config import settings
+from app.util.avatar.avatar_store import avatar_store
+
+# Decoding and encoding the images is done here, so it does not block the event loop.
+avatar_process_executor = ThreadPoolExecutor(
+    max_workers=settings.AVATAR_PROCESS_THREADS, thread_name_prefix="avatar_process"
+)
+
+avatar_formats = ["PNG", "JPEG", "WEBP"]
+
+
+class AvatarImage(NamedTuple):
+    # The avatar is stored by the hash of the png.
+    hash: str
+    png: bytes
+    webp: Optional[bytes]
+
+
+def decode_avatar(avatar_base64: str) -> bytes:
+    try:
+        # Line breaks are allowed, anything else that is not base64 is refused.
+        avatar_bytes = base64.b64decode("".join(avatar_base64.split()), validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("Avatar is not valid base64")
+    if len(avatar_bytes) > settings.AVATAR_MAX_BYTES:
+        raise ValueError("Avatar is too large")
+    return avatar_bytes
+
+
+def open_avatar(avatar_bytes: bytes) -> Image.Image:
+    try:
+        image = Image.open(io.BytesIO(avatar_bytes), formats=avatar_formats)
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        raise ValueError("Avatar is not a valid image")
+    # The size is read from the header, so this is checked before the pixels are decoded.
+    # This way a small file that decodes to a huge image is refused right away.
+    width, height = image.size
+    if width > settings.AVATAR_MAX_DIMENSION or height > settings.AVATAR_MAX_DIMENSION:
+        raise ValueError("Avatar dimensions are too large")
+    try:
+        image.load()
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise ValueError("Avatar is not a valid image")
+    return image
+
+
+def avatar_webp_path(file_path: str) -> str:
+    return os.path.splitext(file_path)[0] + ".webp"
+
+
+def resize_avatar(image: Image.Image, size: int) -> Image.Image:
+    # Cropped to a square around the center, smaller images are not scaled up.
+    side = min(size, *image.size)
+    return ImageOps.fit(image, (side, side), Image.Resampling.LANCZOS)
+
+
+def encode_avatar(
+    image: Image.Image, image_format: str = "PNG", pnginfo: Optional[PngInfo] = None
+) -> bytes:
+    image_bytes = io.BytesIO()
+    image.save(image_bytes, format=image_format, pnginfo=pnginfo)
+    return image_bytes.getvalue()
+
+
+def save_avatar(
+    image: Image.Image,
+    file_path: str,
+    image_format: str = "PNG",
+    pnginfo: Optional[PngInfo] = None,
+):
+    # The avatar store makes sure the avatar is never read while half written.
+    avatar_store.write(file_path, encode_avatar(image, image_format, pnginfo))
+
+
+def make_avatar_image(image: Image.Image, webp: bool = False) -> AvatarImage:
+    png = encode_avatar(image)
+    return AvatarImage(sha256(png).hexdigest(), png, encode_avatar(image, "WEBP") if webp else None)
+
+
+def process_avatar(avatar: str, avatar_small: str) -> List[AvatarImage]:
+    # Both images are checked before anything is made.
+    avatar_image = open_avatar(decode_avatar(avatar))
+    avatar_small_image = open_avatar(decode_avatar(avatar_small))
+    return [make_avatar_image(avatar_image), make_avatar_image(avatar_small_image)]
+
+
+def process_avatar_upload(avatar_bytes: bytes) -> List[AvatarImage]:
+    # All the sizes are made from the one uploaded image, so they always match.
+    # Phones save the photo as it was taken, with the rotation in the exif data.
+    image = ImageOps.exif_transpose(open_avatar(avatar_bytes))
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+    return [
+        make_avatar_image(resize_avatar(image, size), settings.AVATAR_WEBP)
+        for size in [settings.AVATAR_FULL_SIZE, settings.AVATAR_SMALL_SIZE]
+    ]
+
+
+async def process_avatar_async(avatar: str, avatar_small: str) -> List[AvatarImage]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(avatar_process_executor, process_avatar, avatar, avatar_small)
+
+
+async def process_avatar_upload_async(avatar_bytes: bytes) -> List[AvatarImage]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(avatar_process_executor, process_avatar_upload, avatar_bytes)
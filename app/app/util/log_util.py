@@ -0,0 +1,127 @@
+import copy
+import json
+import logging
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from typing import Optional
+
+from app.config.config import settings
+
+# The id of the request or the socket sid that is being handled, added to every log line.
+correlation_id: ContextVar[Optional[str]] = ContextVar("correlation_id", default=None)
+
+# Extra attributes that are added to the json output when they are passed to the logger.
+log_fields = ["event", "sid", "user_id"]
+
+log_listener: Optional[QueueListener] = None
+
+
+class CorrelationFilter(logging.Filter):
+    def filter(self, record):
+        # This runs in the thread that logs, before the record is put on the queue.
+        record.correlation_id = correlation_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    def filter(self, record):
+        # Only a part of the frequent events is logged. Warnings and errors are always logged.
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = settings.LOG_SAMPLE_RATES.get(getattr(record, "event", None), 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class StructuredQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # The default merges the traceback into the message, this keeps it separate.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        log = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "correlation_id": getattr(record, "correlation_id", None),
+        }
+        for field in log_fields:
+            if hasattr(record, field):
+                log[field] = getattr(record, field)
+        if record.exc_text:
+            log["exc_info"] = record.exc_text
+        return json.dumps(log, default=str)
+
+
+def setup_logging():
+    # Logging only puts the record on a queue, the listener thread formats and writes it.
+    # This way a lot of logging, like a connect storm, does not wait on writing to stdout.
+    global log_listener
+    if log_listener is not None:
+        return
+    log_queue = SimpleQueue()
+    queue_handler = StructuredQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter())
+    queue_handler.addFilter(CorrelationFilter())
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+
+    root_logger = logging.getLogger()
+    root_logger.handlers = [queue_handler]
+    root_logger.setLevel(settings.LOG_LEVEL)
+
+    log_listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    log_listener.start()
+
+
+def stop_logging():
+    # Writes the records that are still on the queue.
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+        log_listener = None
+
+
+class CorrelationIdMiddleware:
+    # Gives every http request a correlation id, taken from the X-Request-ID header if it's there.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        if not request_id:
+            request_id = uuid.uuid4().hex
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        token = correlation_id.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            correlation_id.reset(token)
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlmodel import select
+
+from app.config.config import settings
+from app.database import async_session
+from app.models.message import GlobalMessage
+from app.util.pagination_util import global_message_count_key, increment_message_count
+from app.util.redis_util import create_consumer_group, read_stream, redis_client
+
+logger = logging.getLogger(__name__)
+
+timestamp_format = "%Y-%m-%dT%H:%M:%S.%f"
+
+
+async def queue_global_message(body: str, sender_name: str, sender_id: int, timestamp: datetime):
+    # The message is only added to the stream here, the writer will store it later.
+    # The stream is not trimmed, entries are deleted once they are stored.
+    await redis_client.xadd(
+        settings.GLOBAL_MESSAGE_STREAM,
+        {
+            "body": body,
+            "sender_name": sender_name,
+            "sender_id": sender_id,
+            "timestamp": timestamp.strftime(timestamp_format),
+        },
+    )
+
+
+async def store_global_messages(entries):
+    entry_ids = [entry_id for entry_id, _ in entries]
+    messages = [
+        {
+            "body": fields["body"],
+            "sender_name": fields["sender_name"],
+            "sender_id": int(fields["sender_id"]),
+            "timestamp": datetime.strptime(fields["timestamp"], timestamp_format),
+        }
+        for _, fields in entries
+        if fields is not None
+    ]
+
+    async with async_session() as db:
+        # Entries are claimed again if the writer stopped after storing but before acknowledging.
+        # Skip messages that were already stored so they are not stored twice.
+        stored_statement = select(GlobalMessage.sender_id, GlobalMessage.timestamp).where(
+            GlobalMessage.timestamp.in_([message["timestamp"] for message in messages])
+        )
+        stored_results = await db.execute(stored_statement)
+        stored = set(stored_results.all())
+        messages = [
+            message
+            for message in messages
+            if (message["sender_id"], message["timestamp"]) not in stored
+        ]
+        if messages:
+            await db.execute(insert(GlobalMessage), messages)
+            if settings.GLOBAL_MESSAGE_TOTAL_MODE == "counter":
+                await increment_message_count(db, global_message_count_key, len(messages))
+            await db.commit()
+
+    await redis_client.xack(
+        settings.GLOBAL_MESSAGE_STREAM, settings.GLOBAL_MESSAGE_GROUP, *entry_ids
+    )
+    await redis_client.xdel(settings.GLOBAL_MESSAGE_STREAM, *entry_ids)
+
+
+async def run_global_message_writer():
+    await create_consumer_group(settings.GLOBAL_MESSAGE_STREAM, settings.GLOBAL_MESSAGE_GROUP)
+    while True:
+        try:
+            entries = await read_stream(
+                settings.GLOBAL_MESSAGE_STREAM,
+                settings.GLOBAL_MESSAGE_GROUP,
+                settings.GLOBAL_MESSAGE_BATCH_SIZE,
+                settings.GLOBAL_MESSAGE_FLUSH_MS,
+                settings.GLOBAL_MESSAGE_RETRY_MS,
+            )
+            if entries:
+                await store_global_messages(entries)
+                if len(entries) < settings.GLOBAL_MESSAGE_BATCH_SIZE:
+                    # Not a full batch, wait a bit so the next batch can fill up.
+                    await asyncio.sleep(settings.GLOBAL_MESSAGE_FLUSH_MS / 1000)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Global message writer error")
+            await asyncio.sleep(1)
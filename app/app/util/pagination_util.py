@@ -0,0 +1,53 @@
+from fastapi_pagination import Params, create_page
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.models import MessageCount
+
+global_message_count_key = "global"
+
+
+def personal_message_count_key(user_id_1: int, user_id_2: int):
+    # The same key for both users in the conversation
+    return "personal_%s_%s" % (min(user_id_1, user_id_2), max(user_id_1, user_id_2))
+
+
+async def increment_message_count(db: AsyncSession, key: str, amount: int = 1):
+    # Executed in the same transaction as the message insert, so the count stays correct.
+    increment_statement = (
+        insert(MessageCount)
+        .values(key=key, count=amount)
+        .on_conflict_do_update(
+            index_elements=[MessageCount.key],
+            set_={"count": MessageCount.count + amount},
+        )
+    )
+    await db.execute(increment_statement)
+
+
+async def get_page_total(db: AsyncSession, mode: str, query, count_key: str, table_name: str):
+    if mode == "counter":
+        count_statement = select(MessageCount.count).where(MessageCount.key == count_key)
+        results = await db.execute(count_statement)
+        return results.scalar() or 0
+    elif mode == "estimate":
+        # The estimate is the row count of the whole table, as kept by the database planner.
+        estimate_statement = text(
+            "SELECT reltuples::bigint FROM pg_class WHERE relname = :table_name"
+        )
+        results = await db.execute(estimate_statement, {"table_name": table_name})
+        # The estimate is -1 if the table was never analyzed.
+        return max(results.scalar() or 0, 0)
+    else:
+        count_statement = select(func.count()).select_from(query.order_by(None).subquery())
+        results = await db.execute(count_statement)
+        return results.scalar()
+
+
+async def paginate_with_total(db: AsyncSession, query, params: Params, total: int):
+    raw_params = params.to_raw_params().as_limit_offset()
+    results = await db.execute(query.limit(raw_params.limit).offset(raw_params.offset))
+    items = results.scalars().all()
+    return create_page(items, total=total, params=params)
@@ -0,0 +1,38 @@
+import os
+import socket
+
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from app.config.config import settings
+
+redis_client = Redis.from_url(settings.REDIS_URI, decode_responses=True)
+
+# Every api instance reads the streams under its own consumer name
+consumer_name = "%s-%s" % (socket.gethostname(), os.getpid())
+
+
+async def create_consumer_group(stream: str, group: str):
+    try:
+        await redis_client.xgroup_create(stream, group, id="0", mkstream=True)
+    except ResponseError as e:
+        # The group was already created by this or another instance.
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def read_stream(stream: str, group: str, count: int, block: int, min_idle_time: int):
+    # First take over entries that were read but never acknowledged for a while.
+    # This is what gives retries, and picks up the work of instances that have stopped.
+    _, claimed, _ = await redis_client.xautoclaim(
+        stream, group, consumer_name, min_idle_time, start_id="0-0", count=count
+    )
+    if claimed:
+        return claimed
+
+    results = await redis_client.xreadgroup(
+        group, consumer_name, {stream: ">"}, count=count, block=block
+    )
+    if not results:
+        return []
+    return results[0][1]
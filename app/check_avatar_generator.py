@@ -0,0 +1,87 @@
+"""
+Checks that the default avatar generator still makes the same avatars, and measures how
+fast it is. The pixels of the avatars of a fixed set of seeds are compared with the hashes
+of the avatars of the original generator. The avatars are also made in threads at the same
+time, which has to give the same avatars as well.
+
+Run it after changing the generator, it exits with 1 when an avatar is different.
+
+    python check_avatar_generator.py --benchmark 500
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import md5, sha256
+
+from app.util.avatar.generate_avatar import draw_avatar
+from app.util.avatar.process_avatar import encode_avatar
+
+# The avatar file names are md5 hashes, like the ones of the users.
+golden_seeds = [md5(("golden_%s" % i).encode("utf-8")).hexdigest() for i in range(16)]
+golden_hashes = [
+    "e06893806499a43d6f164998a9b7cfa6e577e33087519bd8c2d5029c216bfdad",
+    "346ec9989128248df2e6eeed5096fdeab235def5ec1ecf896b381ea758a170cf",
+    "167dd8cfd6fde734a5612558e6925f06385794ef53cbf2426992430e2d7f104b",
+    "4ac13807ccd05bf14bfc3ab08d2569487da07bdb09b3c2b62ea003026a027e95",
+    "7bfe89b3d35567ebe1a40c4e371a5e44cd85207a124d14441ecc9cb2416ef931",
+    "cc5ac697cd13fa5336dcd0776ca61631e42099c0fdbb1f87311555079f407894",
+    "0bb00fa06a300503fb28168654c158c13a47d1d111af90692a292662403114a6",
+    "9bec5320afa3ca06cfcb5fea30208818789d8fa83eaa11960a7d2170b0ee8ef0",
+    "5b237f17058af0970d24dded54b3de5ee1c8a2e9d37715a0e8d5db619e1fbd5c",
+    "684be6bf7d795943c24d97f30da84f0e6175a9fe43fd22c3d73966c4f2cb7482",
+    "d4f6e2b3f0d33f094a861339231fb62e3c300ee18573a15e5d8cd2174b7d437b",
+    "a42d4e1c063352031d7ded041ae7fb2d61430dc1f36a7ba62435d6a57afe5daf",
+    "7fc52df37e1850aa88342ae780aa2042cf60e34f5860eead29b07c78a82caca7",
+    "02b5013a6f24dd4612043f1de0b1ac24138783bbba50f3c48dbdb96d9db01a38",
+    "148615664e4f4dad7f23aaa5e04a2e100b39a21f3b2e80833104ddd2114e24f0",
+    "d893d0d1ef5f462a6e6bfc35737afd710b8d8a858e6e44a7c9765722a4cb6cc2",
+]
+
+
+def avatar_hash(seed: str) -> str:
+    return sha256(draw_avatar(seed).tobytes()).hexdigest()
+
+
+def check_avatars(threads: int) -> bool:
+    correct = True
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        threaded_hashes = list(executor.map(avatar_hash, golden_seeds * threads))
+    for index, (seed, golden_hash) in enumerate(zip(golden_seeds, golden_hashes)):
+        if avatar_hash(seed) != golden_hash:
+            print("The avatar of seed %s is different" % seed)
+            correct = False
+        elif threaded_hashes[index :: len(golden_seeds)] != [golden_hash] * threads:
+            print("The avatar of seed %s is different when made in threads" % seed)
+            correct = False
+    return correct
+
+
+def benchmark(count: int):
+    start = time.monotonic()
+    for index in range(count):
+        encode_avatar(draw_avatar(md5(("benchmark_%s" % index).encode("utf-8")).hexdigest()))
+    print("%.1f avatars per second" % (count / (time.monotonic() - start)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the default avatar generator")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--benchmark", type=int, default=0, help="also make this many avatars")
+    args = parser.parse_args()
+
+    # Switch threads often, so avatars that are made at the same time influence each other
+    # when the generator is not thread safe.
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    correct = check_avatars(args.threads)
+    sys.setswitchinterval(switch_interval)
+    print("All avatars are the same" if correct else "Some avatars are different")
+    if args.benchmark:
+        benchmark(args.benchmark)
+    sys.exit(0 if correct else 1)
+
+
+if __name__ == "__main__":
+    main()
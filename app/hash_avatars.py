@@ -0,0 +1,98 @@
+"""
+Moves the custom avatars that are still stored under the avatar file name of the user to
+avatar blobs, which are stored by the hash of the image and shared by the users with the
+same image. The avatar urls of the moved users change, so the version is bumped.
+
+It can be stopped and run again, the users that are done are not read again.
+
+    python hash_avatars.py
+"""
+
+import time
+from hashlib import sha256
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlmodel import select
+
+from app.config.config import settings
+from app.models import User
+from app.util.avatar.avatar_blob import (
+    avatar_blob_changes,
+    avatar_blob_ref_statement,
+    remove_avatar_files,
+    store_avatar_blobs,
+)
+from app.util.avatar.avatar_store import avatar_store
+from app.util.avatar.process_avatar import AvatarImage, avatar_webp_path
+
+page_size = 1000
+
+
+def read_avatar_image(file_path: str):
+    png = avatar_store.read(file_path)
+    if png is None:
+        return None
+    return AvatarImage(sha256(png).hexdigest(), png, avatar_store.read(avatar_webp_path(file_path)))
+
+
+def hash_avatars(session: Session, users) -> int:
+    moved = []
+    for user in users:
+        legacy_avatar_paths = user.legacy_avatar_paths()
+        avatar_images = [read_avatar_image(file_path) for file_path in legacy_avatar_paths]
+        if None in avatar_images:
+            print("The avatar of user %s is missing, skipped" % user.id)
+            continue
+        store_avatar_blobs(avatar_images)
+        avatar_hashes = [avatar_image.hash for avatar_image in avatar_images]
+        for avatar_hash, change in avatar_blob_changes(user, avatar_hashes):
+            session.execute(avatar_blob_ref_statement(avatar_hash, change))
+        user.avatar_hash, user.avatar_hash_small = avatar_hashes
+        user.bump_avatar_version()
+        session.add(user)
+        moved.append((avatar_images, legacy_avatar_paths))
+    session.commit()
+
+    for avatar_images, legacy_avatar_paths in moved:
+        # Stored again if the cron job removed a blob before its reference was added.
+        store_avatar_blobs(avatar_images)
+        remove_avatar_files(legacy_avatar_paths)
+    return len(moved)
+
+
+def main():
+    engine = create_engine(settings.SYNC_DB_URL, pool_pre_ping=True)
+    last_user_id = 0
+    done = 0
+    moved = 0
+    start = time.monotonic()
+    while True:
+        with Session(engine) as session:
+            users_statement = (
+                select(User)
+                .where(User.id > last_user_id)
+                .where(User.default_avatar.is_(False))
+                .where(User.avatar_hash.is_(None))
+                .order_by(User.id)
+                .limit(page_size)
+                # Locked until the page is committed, so an avatar that a user changes at
+                # the same time is not overwritten. Those users are skipped, they don't use
+                # their old avatar anymore.
+                .with_for_update(skip_locked=True)
+            )
+            users = session.execute(users_statement).scalars().all()
+            if not users:
+                break
+            last_user_id = users[-1].id
+            moved += hash_avatars(session, users)
+        done += len(users)
+        print(
+            "%s users, %s moved, %.1f users per second"
+            % (done, moved, done / (time.monotonic() - start))
+        )
+    print("Done, %s users in %.1f seconds, %s moved" % (done, time.monotonic() - start, moved))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""
+Load test for the socket server.
+
+Connects a number of simulated socket clients to the app in main.py, lets them join their
+rooms, broadcasts global chat messages and leaderboard updates through redis (the same way
+the other pods and the celery worker do) and lets them leave again. It reports how many
+connections succeeded, the emit to receive latency and the server memory per connection.
+All the clients run in this process, so with a lot of clients the latency also includes the
+time the clients wait on each other. Run more of these processes against --url for that.
+
+By default a server is started with uvicorn against an in-process fakeredis server, so no
+redis or database is needed. The settings are read at import, the ones that are not set
+get a placeholder (the sockets don't use the database or the logins). Use --redis-url to use
+a local redis container instead (docker run -p 6379:6379 redis) and --url to test a server
+that is already running.
+
+    python load_test.py --clients 1000 --messages 200 --rate 20
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import aiohttp
+import socketio
+
+broadcast_events = ["send_message_global", "update_leaderboard"]
+
+# The settings the server needs to start, app/config/config.py reads them at import.
+placeholder_env = {
+    "POSTGRES_URL": "127.0.0.1",
+    "POSTGRES_PORT": "5432",
+    "POSTGRES_USER": "load_test",
+    "POSTGRES_PASSWORD": "load_test",
+    "POSTGRES_DB": "load_test",
+    # Their defaults are not strings, which the settings refuse.
+    "MAIL_PORT": "25",
+    "MAIL_USE_TLS": "load_test",
+    **{
+        name: "load_test"
+        for name in [
+            "GOOGLE_CLIENT_ID",
+            "GOOGLE_CLIENT_SECRET",
+            "GITHUB_CLIENT_ID",
+            "GITHUB_CLIENT_SECRET",
+            "REDDIT_CLIENT_ID",
+            "REDDIT_CLIENT_SECRET",
+            "APPLE_CLIENT_ID",
+            "APPLE_KEY_ID",
+            "APPLE_TEAM_ID",
+            "APPLE_AUTH_KEY",
+            "APPLE_REDIRECT_URL",
+            "MAIL_SERVER",
+            "MAIL_USERNAME",
+            "MAIL_PASSWORD",
+            "MAIL_SENDERNAME",
+            "BASE_URL",
+        ]
+    },
+}
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_redis():
+    from fakeredis import TcpFakeServer
+
+    class FakeRedisServer(TcpFakeServer):
+        # The default backlog of 5 resets connections when a lot of clients connect at once.
+        request_queue_size = 1024
+
+    port = get_free_port()
+    server = FakeRedisServer(("127.0.0.1", port), server_type="redis")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return "127.0.0.1", port
+
+
+def start_server(port: int, redis_host: str, redis_port: int):
+    env = dict(placeholder_env, **os.environ)
+    env.update(REDIS_URL=redis_host, REDIS_PORT=str(redis_port), LOG_LEVEL="WARNING")
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+    )
+
+
+async def wait_for_server(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(url + "/socket.io/?EIO=4&transport=polling") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("The server at %s did not start" % url)
+
+
+def get_rss(pid: Optional[int]) -> Optional[int]:
+    # The resident memory of the server process in bytes, only available on linux.
+    if pid is None:
+        return None
+    try:
+        with open("/proc/%s/status" % pid) as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def percentile(values: List[float], percent: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def format_ms(value: Optional[float]):
+    return "-" if value is None else "%.1f ms" % (value * 1000)
+
+
+class LoadClient:
+    def __init__(self, user_id: int, latencies: Dict[str, List[float]]):
+        self.user_id = user_id
+        self.latencies = latencies
+        self.closing = False
+        # Set when the server disconnects the client, for instance as a slow consumer.
+        self.dropped = False
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.sio.on("disconnect", self.on_disconnect)
+        for event in broadcast_events:
+            self.sio.on(event, self.receiver(event))
+
+    async def on_disconnect(self, *args):
+        if not self.closing:
+            self.dropped = True
+
+    def receiver(self, event: str):
+        async def receive(data):
+            if isinstance(data, dict) and "sent_at" in data:
+                self.latencies[event].append(time.time() - data["sent_at"])
+
+        return receive
+
+    async def connect(self, url: str, timeout: float):
+        await self.sio.connect(url, transports=["websocket"], wait_timeout=timeout)
+
+    async def join(self):
+        await self.sio.emit("join", {"user_id": self.user_id})
+
+    async def leave(self):
+        await self.sio.emit("leave", {"user_id": self.user_id})
+
+    async def disconnect(self):
+        self.closing = True
+        await self.sio.disconnect()
+
+
+async def connect_clients(args, url: str, latencies):
+    semaphore = asyncio.Semaphore(args.connect_concurrency)
+    connect_times = []
+    errors = defaultdict(int)
+
+    async def connect(user_id: int):
+        client = LoadClient(user_id, latencies)
+        async with semaphore:
+            start = time.monotonic()
+            try:
+                await client.connect(url, args.connect_timeout)
+            except Exception as e:
+                errors[type(e).__name__] += 1
+                return None
+            connect_times.append(time.monotonic() - start)
+        return client
+
+    clients = await asyncio.gather(*[connect(user_id) for user_id in range(1, args.clients + 1)])
+    return [client for client in clients if client is not None], connect_times, errors
+
+
+async def broadcast(args, redis_uri: str):
+    # Emitting through redis, like another pod would, so it reaches the clients of every
+    # server process that is connected to this redis.
+    emitter = socketio.AsyncRedisManager(redis_uri, write_only=True)
+    interval = 1 / args.rate
+    for index in range(args.messages):
+        await emitter.emit(
+            "send_message_global",
+            {
+                "body": "load test message %s" % index,
+                "sender_name": "load_test",
+                "sender_id": -1,
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "sent_at": time.time(),
+            },
+            namespace="/",
+        )
+        await emitter.emit(
+            "update_leaderboard",
+            {"score": index, "sent_at": time.time()},
+            namespace="/",
+        )
+        await asyncio.sleep(interval)
+
+
+async def run(args):
+    server = None
+    server_pid = args.pid
+    if args.redis_url:
+        redis_uri = args.redis_url
+        redis_host, redis_port = redis_uri.split("://")[1].split("/")[0].split(":")
+    else:
+        redis_host, redis_port = start_fake_redis()
+        redis_uri = "redis://%s:%s" % (redis_host, redis_port)
+
+    url = args.url
+    if url is None:
+        port = get_free_port()
+        server = start_server(port, redis_host, int(redis_port))
+        server_pid = server.pid
+        url = "http://127.0.0.1:%s" % port
+    try:
+        await wait_for_server(url)
+        rss_before = get_rss(server_pid)
+        latencies = defaultdict(list)
+
+        start = time.monotonic()
+        clients, connect_times, errors = await connect_clients(args, url, latencies)
+        connect_duration = time.monotonic() - start
+        await asyncio.gather(*[client.join() for client in clients])
+        await asyncio.sleep(args.settle)
+        rss_after = get_rss(server_pid)
+
+        await broadcast(args, redis_uri)
+        # Waiting until everything is received, or until the drain time is over.
+        expected = len(clients) * args.messages * len(broadcast_events)
+        deadline = time.monotonic() + args.drain
+        while time.monotonic() < deadline:
+            if sum(len(latencies[event]) for event in broadcast_events) >= expected:
+                break
+            await asyncio.sleep(0.1)
+
+        dropped = len([client for client in clients if client.dropped])
+        clients = [client for client in clients if not client.dropped]
+        await asyncio.gather(*[client.leave() for client in clients])
+        await asyncio.gather(*[client.disconnect() for client in clients], return_exceptions=True)
+        # Give the server the time to handle the disconnects before it's stopped.
+        await asyncio.sleep(args.settle)
+
+        print("connections: %s of %s in %.1f s" % (len(clients), args.clients, connect_duration))
+        for error, count in errors.items():
+            print("  failed: %s x %s" % (count, error))
+        print("disconnected by the server during the test: %s" % dropped)
+        print(
+            "connect time: p50 %s, p99 %s"
+            % (format_ms(percentile(connect_times, 50)), format_ms(percentile(connect_times, 99)))
+        )
+        expected = (len(clients) + dropped) * args.messages
+        for event in broadcast_events:
+            received = latencies[event]
+            print(
+                "%s: received %s of %s, p50 %s, p99 %s, max %s"
+                % (
+                    event,
+                    len(received),
+                    expected,
+                    format_ms(percentile(received, 50)),
+                    format_ms(percentile(received, 99)),
+                    format_ms(max(received) if received else None),
+                )
+            )
+        if rss_before is not None and rss_after is not None and clients:
+            print(
+                "server memory: %.1f MB before, %.1f MB after, %.1f KB per connection"
+                % (
+                    rss_before / 1024 / 1024,
+                    rss_after / 1024 / 1024,
+                    (rss_after - rss_before) / len(clients) / 1024,
+                )
+            )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the socket server")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=100, help="broadcasts of every event")
+    parser.add_argument("--rate", type=float, default=10, help="broadcasts per second")
+    parser.add_argument("--connect-concurrency", type=int, default=100)
+    parser.add_argument("--connect-timeout", type=float, default=10)
+    parser.add_argument("--settle", type=float, default=2, help="seconds to wait after joining")
+    parser.add_argument("--drain", type=float, default=30, help="max seconds to wait for delivery")
+    parser.add_argument("--url", help="url of a running server, otherwise one is started")
+    parser.add_argument("--pid", type=int, help="pid of the running server, for the memory")
+    parser.add_argument("--redis-url", help="redis to use, otherwise fakeredis is started")
+    args = parser.parse_args()
+    if args.url and not args.redis_url:
+        parser.error("--redis-url is needed to broadcast to a running server")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
 
+import asyncio
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import APIRouter, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -6,9 +9,34 @@ from fastapi_pagination import add_pagination
 
 from app.api import api_login, api_v1
 from app.config.config import settings
+from app.sockets.outbox import run_outbox_publisher
+from app.sockets.presence import run_presence_refresh
+from app.sockets.registry import run_node_heartbeat
 from app.sockets.sockets import sio_app
+from app.util.log_util import CorrelationIdMiddleware, setup_logging, stop_logging
+from app.util.message_writer import run_global_message_writer
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    setup_logging()
+    # The outbox publisher emits the socket events in the background. The node heartbeat
+    # keeps the socket connections of this instance in the registry and the presence refresh
+    # keeps their users online.
+    background_tasks = [
+        asyncio.create_task(run_outbox_publisher()),
+        asyncio.create_task(run_node_heartbeat()),
+        asyncio.create_task(run_presence_refresh()),
+    ]
+    if settings.GLOBAL_MESSAGE_WRITE_BEHIND:
+        background_tasks.append(asyncio.create_task(run_global_message_writer()))
+    yield
+    for background_task in background_tasks:
+        background_task.cancel()
+    stop_logging()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 add_pagination(app)
 
@@ -22,6 +50,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CorrelationIdMiddleware)
 
 api_router = APIRouter()
 api_router.include_router(api_v1.api_router_v1, tags=["api_v1"])
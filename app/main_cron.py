@@ -1,13 +1,17 @@
 import asyncio
 import time
+from datetime import datetime, timedelta
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, func
 from sqlalchemy.orm import Session
-from sqlmodel import delete
+from sqlmodel import delete, select, update
 
 from app.config.config import settings
-from app.models import UserToken
+from app.models import AvatarBlob, MessageCount, UserToken
+from app.models.message import GlobalMessage, GlobalMessageArchive
+from app.util.avatar.avatar_blob import remove_avatar_files
+from app.util.pagination_util import global_message_count_key
 
 engine_sync = create_engine(settings.SYNC_DB_URL, pool_pre_ping=True, pool_size=32, max_overflow=64)
 
@@ -21,9 +25,86 @@ def remove_expired_tokens():
         session.commit()
 
 
+def archive_global_messages():
+    retention_limit = datetime.utcnow() - timedelta(days=settings.GLOBAL_MESSAGE_RETENTION_DAYS)
+    with Session(engine_sync) as session:
+        # We archive one chunk of messages at a time, to keep the transactions and the
+        # memory small. A chunk only has messages of one day.
+        while True:
+            oldest_timestamp = session.execute(
+                select(func.min(GlobalMessage.timestamp)).where(
+                    GlobalMessage.timestamp < retention_limit
+                )
+            ).scalar()
+            if oldest_timestamp is None:
+                break
+
+            day = oldest_timestamp.date()
+            day_start = datetime.combine(day, datetime.min.time())
+            day_end = min(day_start + timedelta(days=1), retention_limit)
+
+            messages_statement = (
+                select(GlobalMessage)
+                .where(GlobalMessage.timestamp >= day_start)
+                .where(GlobalMessage.timestamp < day_end)
+                .order_by(GlobalMessage.timestamp, GlobalMessage.id)
+                .limit(settings.GLOBAL_MESSAGE_ARCHIVE_CHUNK_SIZE)
+            )
+            messages = session.execute(messages_statement).scalars().all()
+
+            # A day can be archived in parts, the rest of the day is added as new chunks.
+            last_chunk = session.execute(
+                select(func.max(GlobalMessageArchive.chunk)).where(GlobalMessageArchive.day == day)
+            ).scalar()
+            chunk = 0 if last_chunk is None else last_chunk + 1
+            archive = GlobalMessageArchive(day=day, chunk=chunk)
+            archive.set_messages([message.serialize for message in messages])
+            session.add(archive)
+
+            delete_archived_messages = delete(GlobalMessage).where(
+                GlobalMessage.id.in_([message.id for message in messages])
+            )
+            session.execute(delete_archived_messages)
+            if settings.GLOBAL_MESSAGE_TOTAL_MODE == "counter":
+                update_message_count = (
+                    update(MessageCount)
+                    .where(MessageCount.key == global_message_count_key)
+                    .values(count=MessageCount.count - len(messages))
+                )
+                session.execute(update_message_count)
+            session.commit()
+            # The messages are not needed in the session anymore.
+            session.expunge_all()
+
+
+def remove_released_avatar_blobs():
+    released_limit = datetime.utcnow() - timedelta(hours=settings.AVATAR_BLOB_RELEASE_HOURS)
+    with Session(engine_sync) as session:
+        while True:
+            # The blobs are locked while their files are removed. A user that starts using
+            # one again waits for this, and then stores the image again.
+            blobs_statement = (
+                select(AvatarBlob.hash)
+                .where(AvatarBlob.ref_count <= 0)
+                .where(AvatarBlob.released_at < released_limit)
+                .limit(1000)
+                .with_for_update(skip_locked=True)
+            )
+            avatar_hashes = session.execute(blobs_statement).scalars().all()
+            if not avatar_hashes:
+                break
+            remove_avatar_files(
+                [AvatarBlob.file_path(avatar_hash) for avatar_hash in avatar_hashes]
+            )
+            session.execute(delete(AvatarBlob).where(AvatarBlob.hash.in_(avatar_hashes)))
+            session.commit()
+
+
 async def main():
     scheduler = AsyncIOScheduler()
     scheduler.add_job(remove_expired_tokens, trigger="cron", hour="0", minute="0")
+    scheduler.add_job(archive_global_messages, trigger="cron", hour="1", minute="0")
+    scheduler.add_job(remove_released_avatar_blobs, trigger="cron", hour="2", minute="0")
     scheduler.start()
 
     await asyncio.Future()
@@ -0,0 +1,89 @@
+"""archive global messages in chunks
+
+Revision ID: 7c3e9a4f2b18
+Revises: 4e8b2d7a1c65
+Create Date: 2025-03-15 11:04:26.553871
+
+"""
+import json
+import zlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3e9a4f2b18'
+down_revision: Union[str, None] = '4e8b2d7a1c65'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The same as GLOBAL_MESSAGE_ARCHIVE_CHUNK_SIZE when this was made.
+chunk_size = 1000
+
+
+def upgrade() -> None:
+    op.add_column('GlobalMessageArchive', sa.Column('chunk', sa.Integer(), server_default='0', nullable=False))
+    op.drop_index('ix_GlobalMessageArchive_day', table_name='GlobalMessageArchive')
+    op.create_index(op.f('ix_GlobalMessageArchive_day'), 'GlobalMessageArchive', ['day'], unique=False)
+    op.create_index('global_message_archive_day_chunk_index', 'GlobalMessageArchive', ['day', 'chunk'], unique=True)
+
+    # The days that were archived before are split in chunks, one day at a time.
+    connection = op.get_bind()
+    archive_ids = connection.execute(
+        sa.text('SELECT id FROM "GlobalMessageArchive" WHERE message_count > :chunk_size'),
+        {"chunk_size": chunk_size},
+    ).scalars().all()
+    for archive_id in archive_ids:
+        day, messages = connection.execute(
+            sa.text('SELECT day, messages FROM "GlobalMessageArchive" WHERE id = :id'),
+            {"id": archive_id},
+        ).one()
+        messages = json.loads(zlib.decompress(messages))
+        connection.execute(sa.text('DELETE FROM "GlobalMessageArchive" WHERE id = :id'), {"id": archive_id})
+        for chunk, start in enumerate(range(0, len(messages), chunk_size)):
+            chunk_messages = messages[start : start + chunk_size]
+            connection.execute(
+                sa.text(
+                    'INSERT INTO "GlobalMessageArchive" (day, chunk, message_count, messages) '
+                    'VALUES (:day, :chunk, :message_count, :messages)'
+                ),
+                {
+                    "day": day,
+                    "chunk": chunk,
+                    "message_count": len(chunk_messages),
+                    "messages": zlib.compress(json.dumps(chunk_messages).encode("utf-8"), 9),
+                },
+            )
+
+
+def downgrade() -> None:
+    # The chunks of a day are put together again.
+    connection = op.get_bind()
+    days = connection.execute(
+        sa.text('SELECT day FROM "GlobalMessageArchive" GROUP BY day HAVING COUNT(*) > 1')
+    ).scalars().all()
+    for day in days:
+        chunks = connection.execute(
+            sa.text('SELECT messages FROM "GlobalMessageArchive" WHERE day = :day ORDER BY chunk'),
+            {"day": day},
+        ).scalars().all()
+        messages = [message for chunk in chunks for message in json.loads(zlib.decompress(chunk))]
+        connection.execute(sa.text('DELETE FROM "GlobalMessageArchive" WHERE day = :day'), {"day": day})
+        connection.execute(
+            sa.text(
+                'INSERT INTO "GlobalMessageArchive" (day, message_count, messages) '
+                'VALUES (:day, :message_count, :messages)'
+            ),
+            {
+                "day": day,
+                "message_count": len(messages),
+                "messages": zlib.compress(json.dumps(messages).encode("utf-8"), 9),
+            },
+        )
+
+    op.drop_index('global_message_archive_day_chunk_index', table_name='GlobalMessageArchive')
+    op.drop_index(op.f('ix_GlobalMessageArchive_day'), table_name='GlobalMessageArchive')
+    op.create_index('ix_GlobalMessageArchive_day', 'GlobalMessageArchive', ['day'], unique=True)
+    op.drop_column('GlobalMessageArchive', 'chunk')
@@ -0,0 +1,122 @@
+"""
+Manages the pack files of the avatars, used when AVATAR_STORE is "pack".
+
+migrate copies the avatar files from the avatar folder into the packs. An avatar that is
+already in the packs and not older than its file is skipped, so it can be run again to copy
+what changed in the meantime. To switch, migrate while the servers still use the files,
+set AVATAR_STORE to "pack" and restart them, and migrate once more.
+
+compact removes the avatars that were replaced or removed from the packs, it can run while
+the servers are using them. stats shows how much of the packs is still used.
+
+    python pack_avatars.py migrate
+    python pack_avatars.py compact --min-unused 0.3
+"""
+
+import argparse
+import os
+import time
+
+from app.config.config import settings
+from app.util.avatar.avatar_store import PackAvatarStore
+
+batch_size = 1000
+avatar_extensions = (".png", ".webp")
+
+
+def get_pack_store() -> PackAvatarStore:
+    return PackAvatarStore(
+        settings.AVATAR_PACK_FOLDER,
+        settings.AVATAR_PACK_MAX_BYTES,
+        settings.AVATAR_PACK_REFRESH_SECONDS,
+    )
+
+
+def migrate(pack_store: PackAvatarStore, remove: bool = False):
+    start = time.monotonic()
+    done = 0
+    copied = 0
+    batch = []
+    batch_paths = []
+
+    def write_batch():
+        pack_store.write_many(batch)
+        if remove:
+            for file_path in batch_paths:
+                os.remove(file_path)
+        batch.clear()
+        batch_paths.clear()
+
+    # scandir does not sort the directory, which is slow for millions of files.
+    with os.scandir(settings.UPLOAD_FOLDER_AVATARS) as avatar_files:
+        for avatar_file in avatar_files:
+            if not avatar_file.name.endswith(avatar_extensions) or not avatar_file.is_file():
+                continue
+            done += 1
+            mtime_ns = avatar_file.stat().st_mtime_ns
+            entry = pack_store.entry(avatar_file.name)
+            if entry is None or entry.written_ns < mtime_ns:
+                with open(avatar_file.path, "rb") as fd:
+                    batch.append((avatar_file.name, fd.read(), mtime_ns))
+                copied += 1
+            if remove:
+                batch_paths.append(avatar_file.path)
+            if len(batch) >= batch_size or len(batch_paths) >= batch_size:
+                write_batch()
+            if done % batch_size == 0:
+                print(
+                    "%s avatars, %s copied, %.1f avatars per second"
+                    % (done, copied, done / (time.monotonic() - start))
+                )
+    write_batch()
+    print("Done, %s avatars in %.1f seconds, %s copied" % (done, time.monotonic() - start, copied))
+
+
+def print_stats(pack_store: PackAvatarStore):
+    stats = pack_store.stats()
+    print(
+        "%s avatars, %s of %s bytes used"
+        % (stats["avatars"], stats["live_bytes"], stats["pack_bytes"])
+    )
+
+
+def compact(pack_store: PackAvatarStore, min_unused: float):
+    stats = pack_store.stats()
+    unused = 1 - stats["live_bytes"] / stats["pack_bytes"] if stats["pack_bytes"] else 0
+    if unused < min_unused:
+        print("%.1f%% of the packs is unused, not compacting" % (unused * 100))
+        return
+    start = time.monotonic()
+    pack_store.compact()
+    print("Compacted in %.1f seconds" % (time.monotonic() - start))
+    print_stats(pack_store)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the avatar packs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="copy the avatar files to the packs")
+    migrate_parser.add_argument(
+        "--remove", action="store_true", help="remove the avatar files once they are copied"
+    )
+    compact_parser = subparsers.add_parser("compact", help="remove the unused avatars")
+    compact_parser.add_argument(
+        "--min-unused",
+        type=float,
+        default=0,
+        help="only compact when at least this part of the packs is unused",
+    )
+    subparsers.add_parser("stats", help="show how much of the packs is used")
+    args = parser.parse_args()
+
+    pack_store = get_pack_store()
+    if args.command == "migrate":
+        migrate(pack_store, args.remove)
+    elif args.command == "compact":
+        compact(pack_store, args.min_unused)
+    else:
+        print_stats(pack_store)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Regenerates the default avatars of all the users, for instance after the colours of the
+generator changed or when the avatar volume has to be restored.
+
+The users are read from the database in pages and the avatars of a page are generated in
+a process pool. An avatar that exists and was made by the current GENERATOR_VERSION is
+skipped, unless --force is given. The id of the last handled user is written to the
+checkpoint file, so a run that is stopped continues where it was with --resume.
+
+    python regenerate_avatars.py --processes 8 --resume
+"""
+
+import argparse
+import os
+import time
+from functools import partial
+from hashlib import md5
+from multiprocessing import Pool
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import Session
+from sqlmodel import select, update
+
+from app.config.config import settings
+from app.models import User
+from app.util.avatar.avatar_store import avatar_store
+from app.util.avatar.generate_avatar import (
+    GENERATOR_VERSION,
+    avatar_generator_version,
+    generate_avatar,
+)
+
+page_size = 1000
+default_checkpoint_file = "regenerate_avatars.checkpoint"
+
+
+def default_avatar_path(email_hash: str):
+    # The same file name as User.avatar_filename_default
+    file_name = md5(email_hash.encode("utf-8")).hexdigest()
+    return os.path.join(settings.UPLOAD_FOLDER_AVATARS, "%s_default.png" % file_name)
+
+
+def regenerate_avatar(user, force: bool = False):
+    # Runs in the process pool, returns if the avatar was generated.
+    user_id, email_hash = user
+    file_path = default_avatar_path(email_hash)
+    if not force:
+        avatar = avatar_store.read(file_path)
+        if avatar is not None and avatar_generator_version(avatar) >= GENERATOR_VERSION:
+            return user_id, False
+    generate_avatar(md5(email_hash.encode("utf-8")).hexdigest(), settings.UPLOAD_FOLDER_AVATARS)
+    return user_id, True
+
+
+def read_checkpoint(checkpoint_file: str) -> int:
+    try:
+        with open(checkpoint_file) as checkpoint:
+            return int(checkpoint.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def write_checkpoint(checkpoint_file: str, user_id: int):
+    temp_file = checkpoint_file + ".tmp"
+    with open(temp_file, "w") as checkpoint:
+        checkpoint.write(str(user_id))
+    os.replace(temp_file, checkpoint_file)
+
+
+def get_user_pages(engine, last_user_id: int):
+    # The users are read in pages of ids, so the whole table is never loaded at once.
+    while True:
+        with Session(engine) as session:
+            users_statement = (
+                select(User.id, User.email_hash)
+                .where(User.id > last_user_id)
+                .order_by(User.id)
+                .limit(page_size)
+            )
+            users = session.execute(users_statement).all()
+        if not users:
+            return
+        yield [(user.id, user.email_hash) for user in users]
+        last_user_id = users[-1].id
+
+
+def bump_avatar_versions(engine, user_ids):
+    # The avatar urls of the users that still use the default avatar have to change,
+    # otherwise the clients keep showing the old avatar they cached.
+    if not user_ids:
+        return
+    with Session(engine) as session:
+        session.execute(
+            update(User)
+            .where(User.id.in_(user_ids))
+            .where(User.default_avatar.is_(True))
+            .values(avatar_version=User.avatar_version + 1)
+        )
+        session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate the default avatars")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--force", action="store_true", help="also regenerate up to date avatars")
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint")
+    parser.add_argument("--checkpoint", default=default_checkpoint_file)
+    args = parser.parse_args()
+
+    engine = create_engine(settings.SYNC_DB_URL, pool_pre_ping=True)
+    last_user_id = read_checkpoint(args.checkpoint) if args.resume else 0
+    with Session(engine) as session:
+        total = session.execute(select(func.count(User.id)).where(User.id > last_user_id)).scalar()
+    print(
+        "Regenerating avatars of %s users with generator version %s, starting after user %s"
+        % (total, GENERATOR_VERSION, last_user_id)
+    )
+
+    done = 0
+    generated_total = 0
+    start = time.monotonic()
+    with Pool(args.processes) as pool:
+        # One page at a time, the next page is only read when this one is done.
+        for users in get_user_pages(engine, last_user_id):
+            results = pool.map(partial(regenerate_avatar, force=args.force), users, chunksize=16)
+            generated = [user_id for user_id, is_generated in results if is_generated]
+            bump_avatar_versions(engine, generated)
+            done += len(users)
+            generated_total += len(generated)
+            write_checkpoint(args.checkpoint, users[-1][0])
+            rate = done / (time.monotonic() - start)
+            print(
+                "%s/%s users, %s generated, %.1f users per second"
+                % (done, total, generated_total, rate)
+            )
+
+    print(
+        "Done, %s users in %.1f seconds, %s generated"
+        % (done, time.monotonic() - start, generated_total)
+    )
+
+
+if __name__ == "__main__":
+    main()